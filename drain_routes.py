@@ -0,0 +1,235 @@
+import asyncio
+import time
+import uuid
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+from server import PromptServer
+
+from .nodes.auto_queue_control import add_exhaustion_listener, remove_exhaustion_listener
+
+ITERATOR_NODE_TYPES = {"ImageIterator", "EditDatasetLoader"}
+DEFAULT_IN_FLIGHT = 2
+MAX_IN_FLIGHT = 64
+QUEUE_POLL_INTERVAL = 0.25
+MAX_FINISHED_JOBS = 32
+
+_JOBS: dict[str, "DrainJob"] = {}
+
+
+class DrainJob:
+    def __init__(self, prompt: dict[str, Any], client_id: str | None, extra_data: dict[str, Any],
+                 in_flight: int, max_prompts: int) -> None:
+        self.job_id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.client_id = client_id
+        self.extra_data = extra_data
+        self.in_flight = in_flight
+        self.max_prompts = max_prompts
+        self.prompt_ids: set[str] = set()
+        self.unfinished_ids: set[str] = set()
+        self.queued = 0
+        self.status = "running"
+        self.error: str | None = None
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.exhausted = asyncio.Event()
+        self.cancelled = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "max_prompts": self.max_prompts,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _prompt_url() -> str:
+    server = PromptServer.instance
+    address = getattr(server, "address", None) or "127.0.0.1"
+    if address in ("0.0.0.0", "::", ""):
+        address = "127.0.0.1"
+    if ":" in address:
+        address = f"[{address}]"
+    port = getattr(server, "port", 8188)
+
+    scheme = "http"
+    try:
+        from comfy.cli_args import args
+
+        if getattr(args, "tls_keyfile", None) and getattr(args, "tls_certfile", None):
+            scheme = "https"
+    except Exception:
+        pass
+
+    return f"{scheme}://{address}:{port}/prompt"
+
+
+def _tasks_remaining() -> int:
+    return PromptServer.instance.prompt_queue.get_tasks_remaining()
+
+
+def _drop_queued_prompts(job: DrainJob) -> None:
+    queue = PromptServer.instance.prompt_queue
+    delete_queue_item = getattr(queue, "delete_queue_item", None)
+    if delete_queue_item is None:
+        return
+
+    for prompt_id in list(job.prompt_ids):
+        delete_queue_item(lambda item, target=prompt_id: len(item) > 1 and item[1] == target)
+
+
+def _find_failed_prompt(job: DrainJob) -> str | None:
+    queue = PromptServer.instance.prompt_queue
+    for prompt_id in list(job.unfinished_ids):
+        entry = queue.get_history(prompt_id=prompt_id).get(prompt_id)
+        if entry is None:
+            continue
+        job.unfinished_ids.discard(prompt_id)
+        for event, data in entry.get("status", {}).get("messages", []):
+            if event == "execution_error":
+                return (f"Prompt {prompt_id} failed in {data.get('node_type', 'unknown node')}: "
+                        f"{data.get('exception_message', '').strip()}")
+    return None
+
+
+async def _queue_prompt(session: aiohttp.ClientSession, url: str, job: DrainJob) -> str:
+    payload: dict[str, Any] = {"prompt": job.prompt, "extra_data": job.extra_data}
+    if job.client_id:
+        payload["client_id"] = job.client_id
+
+    async with session.post(url, json=payload, ssl=False) as response:
+        body = await response.json(content_type=None)
+        if response.status != 200:
+            raise RuntimeError(f"Prompt rejected ({response.status}): {body.get('error', body)}")
+        return body["prompt_id"]
+
+
+async def _run_job(job: DrainJob) -> None:
+    loop = asyncio.get_running_loop()
+
+    def on_exhausted(source: str, prompt_id: str | None, payload: dict[str, Any]) -> None:
+        if prompt_id in job.prompt_ids:
+            loop.call_soon_threadsafe(job.exhausted.set)
+
+    add_exhaustion_listener(on_exhausted)
+    url = _prompt_url()
+    try:
+        async with aiohttp.ClientSession() as session:
+            while not job.exhausted.is_set() and not job.cancelled.is_set():
+                if job.max_prompts and job.queued >= job.max_prompts:
+                    job.status = "completed"
+                    break
+
+                failure = _find_failed_prompt(job)
+                if failure is not None:
+                    raise RuntimeError(failure)
+
+                if _tasks_remaining() >= job.in_flight:
+                    try:
+                        await asyncio.wait_for(job.exhausted.wait(), timeout=QUEUE_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                prompt_id = await _queue_prompt(session, url, job)
+                job.prompt_ids.add(prompt_id)
+                job.unfinished_ids.add(prompt_id)
+                job.queued += 1
+
+        if job.exhausted.is_set():
+            job.status = "exhausted"
+            _drop_queued_prompts(job)
+        elif job.cancelled.is_set():
+            job.status = "cancelled"
+            _drop_queued_prompts(job)
+    except Exception as exc:
+        job.status = "error"
+        job.error = str(exc)
+        _drop_queued_prompts(job)
+        print(f"[ImageAnything] Drain job {job.job_id} failed: {exc}")
+    finally:
+        remove_exhaustion_listener(on_exhausted)
+        job.finished_at = time.time()
+        _prune_finished_jobs()
+
+
+def _prune_finished_jobs() -> None:
+    finished = [job for job in _JOBS.values() if job.finished_at is not None]
+    finished.sort(key=lambda job: job.finished_at)
+    for job in finished[:-MAX_FINISHED_JOBS]:
+        _JOBS.pop(job.job_id, None)
+
+
+def _has_iterator_node(prompt: dict[str, Any]) -> bool:
+    return any(
+        isinstance(node, dict) and node.get("class_type") in ITERATOR_NODE_TYPES
+        for node in prompt.values()
+    )
+
+
+@PromptServer.instance.routes.post("/image_anything/drain")
+async def start_drain(request: web.Request) -> web.Response:
+    try:
+        payload: dict[str, Any] = await request.json()
+    except Exception:
+        return web.json_response({"status": "error", "message": "Request body must be JSON."}, status=400)
+
+    prompt = payload.get("prompt")
+    if not isinstance(prompt, dict) or not _has_iterator_node(prompt):
+        return web.json_response(
+            {
+                "status": "error",
+                "message": "prompt must be an API-format graph containing an ImageIterator or EditDatasetLoader.",
+            },
+            status=400,
+        )
+
+    try:
+        in_flight = int(payload.get("in_flight", DEFAULT_IN_FLIGHT))
+        max_prompts = int(payload.get("max_prompts", 0))
+    except (TypeError, ValueError):
+        return web.json_response({"status": "error", "message": "in_flight and max_prompts must be integers."}, status=400)
+
+    job = DrainJob(
+        prompt=prompt,
+        client_id=payload.get("client_id"),
+        extra_data=payload.get("extra_data") or {},
+        in_flight=max(1, min(in_flight, MAX_IN_FLIGHT)),
+        max_prompts=max(0, max_prompts),
+    )
+    _JOBS[job.job_id] = job
+    job.task = asyncio.create_task(_run_job(job))
+    return web.json_response({"status": "started", "job": job.to_dict()})
+
+
+@PromptServer.instance.routes.get("/image_anything/drain")
+async def list_drains(request: web.Request) -> web.Response:
+    return web.json_response({"jobs": [job.to_dict() for job in _JOBS.values()]})
+
+
+@PromptServer.instance.routes.get("/image_anything/drain/{job_id}")
+async def get_drain(request: web.Request) -> web.Response:
+    job = _JOBS.get(request.match_info["job_id"])
+    if job is None:
+        return web.json_response({"status": "error", "message": "Unknown drain job."}, status=404)
+    return web.json_response({"status": "success", "job": job.to_dict()})
+
+
+@PromptServer.instance.routes.post("/image_anything/drain/{job_id}/stop")
+async def stop_drain(request: web.Request) -> web.Response:
+    job = _JOBS.get(request.match_info["job_id"])
+    if job is None:
+        return web.json_response({"status": "error", "message": "Unknown drain job."}, status=404)
+
+    job.cancelled.set()
+    if job.task is not None and job.status == "running":
+        await job.task
+    return web.json_response({"status": "success", "job": job.to_dict()})
@@ -1,6 +1,9 @@
 import asyncio
 import os
 import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from aiohttp import web
@@ -8,7 +11,46 @@ from server import PromptServer
 
 import folder_paths
 
-_PICKER_LOCK = asyncio.Lock()
+DEFAULT_PICKER_TIMEOUT = 300
+MAX_PICKER_TIMEOUT = 3600
+DEFAULT_LIST_LIMIT = 200
+MAX_LIST_LIMIT = 1000
+# Extra roots for list-dirs can be added under this key in extra_model_paths.yaml.
+LIST_ROOTS_FOLDER_NAME = "image_anything_roots"
+
+# Dialogs run in a child process on their own thread so they never occupy the loop's default executor.
+_PICKER_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image_anything_picker")
+_PICKER_PROCESS_LOCK = threading.Lock()
+_PICKER_CANCELLED = threading.Event()
+_picker_process: subprocess.Popen | None = None
+_picker_busy = False
+
+_TK_PICKER_SCRIPT = r"""
+import sys
+import tkinter as tk
+from tkinter import filedialog
+
+root = tk.Tk()
+root.withdraw()
+try:
+    root.attributes("-topmost", True)
+except Exception:
+    pass
+try:
+    selected = filedialog.askdirectory(
+        initialdir=sys.argv[1],
+        title="Select image folder",
+        mustexist=True,
+        parent=root,
+    )
+finally:
+    root.destroy()
+sys.stdout.buffer.write((selected or "").encode("utf-8"))
+"""
+
+
+class PickerCancelled(Exception):
+    pass
 
 
 def _get_default_directory(directory_type: str | None) -> str:
@@ -29,30 +71,60 @@ def _normalize_initial_path(initial_path: str | None, directory_type: str | None
     return _get_default_directory(directory_type)
 
 
-def _pick_directory_tk(initial_path: str) -> str | None:
-    import tkinter as tk
-    from tkinter import filedialog
+def _get_list_roots() -> list[str]:
+    roots = [
+        folder_paths.get_input_directory(),
+        folder_paths.get_output_directory(),
+        folder_paths.get_user_directory(),
+    ]
+    if LIST_ROOTS_FOLDER_NAME in folder_paths.folder_names_and_paths:
+        roots.extend(folder_paths.get_folder_paths(LIST_ROOTS_FOLDER_NAME))
+    return [os.path.realpath(root) for root in roots if root]
+
+
+def _is_listable(path: str, roots: list[str]) -> bool:
+    real_path = os.path.realpath(path)
+    for root in roots:
+        try:
+            if os.path.commonpath([real_path, root]) == root:
+                return True
+        except ValueError:
+            continue
+    return False
 
-    root = tk.Tk()
-    root.withdraw()
-    try:
-        root.attributes("-topmost", True)
-    except Exception:
-        pass
 
+def _run_picker_process(args: list[str], timeout: float) -> tuple[int, str, str]:
+    global _picker_process
+
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with _PICKER_PROCESS_LOCK:
+        _picker_process = process
     try:
-        selected = filedialog.askdirectory(
-            initialdir=initial_path,
-            title="Select image folder",
-            mustexist=True,
-            parent=root,
-        )
-        return selected or None
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise
     finally:
-        root.destroy()
+        with _PICKER_PROCESS_LOCK:
+            _picker_process = None
+
+    if _PICKER_CANCELLED.is_set():
+        raise PickerCancelled()
+    return process.returncode, stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
 
 
-def _pick_directory_powershell(initial_path: str) -> str | None:
+def _pick_directory_tk(initial_path: str, timeout: float) -> str | None:
+    returncode, stdout, stderr = _run_picker_process(
+        [sys.executable, "-c", _TK_PICKER_SCRIPT, initial_path],
+        timeout,
+    )
+    if returncode != 0:
+        raise RuntimeError(stderr.strip().splitlines()[-1] if stderr.strip() else "Tk folder picker failed.")
+    return stdout.strip() or None
+
+
+def _pick_directory_powershell(initial_path: str, timeout: float) -> str | None:
     escaped_path = initial_path.replace("'", "''")
     command = rf"""
 Add-Type -AssemblyName System.Windows.Forms
@@ -67,33 +139,58 @@ if ($result -eq [System.Windows.Forms.DialogResult]::OK) {{
 }}
 """
 
-    completed = subprocess.run(
+    returncode, stdout, stderr = _run_picker_process(
         ["powershell", "-NoProfile", "-STA", "-Command", command],
-        capture_output=True,
-        text=True,
-        check=False,
+        timeout,
     )
 
-    if completed.returncode not in (0, 1):
-        stderr = completed.stderr.strip()
-        raise RuntimeError(stderr or "PowerShell folder picker failed.")
+    if returncode not in (0, 1):
+        raise RuntimeError(stderr.strip() or "PowerShell folder picker failed.")
 
-    selected = completed.stdout.strip()
-    return selected or None
+    return stdout.strip() or None
 
 
-def _pick_directory(initial_path: str) -> str | None:
+def _pick_directory(initial_path: str, timeout: float) -> str | None:
     try:
-        return _pick_directory_tk(initial_path)
+        return _pick_directory_tk(initial_path, timeout)
+    except (PickerCancelled, subprocess.TimeoutExpired):
+        raise
     except Exception:
         if os.name == "nt":
-            return _pick_directory_powershell(initial_path)
+            return _pick_directory_powershell(initial_path, timeout)
         raise
 
 
-async def _run_picker(initial_path: str) -> str | None:
+async def _run_picker(initial_path: str, timeout: float) -> str | None:
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _pick_directory, initial_path)
+    _PICKER_CANCELLED.clear()
+    return await loop.run_in_executor(_PICKER_EXECUTOR, _pick_directory, initial_path, timeout)
+
+
+def _list_directories(path: str, offset: int, limit: int, roots: list[str]) -> dict[str, Any]:
+    names = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    names.append(entry.name)
+            except OSError:
+                continue
+    names.sort(key=str.lower)
+
+    parent = os.path.dirname(path)
+    return {
+        "status": "success",
+        "path": path,
+        "parent": parent if parent and parent != path and _is_listable(parent, roots) else None,
+        "offset": offset,
+        "limit": limit,
+        "total": len(names),
+        "directories": [
+            {"name": name, "path": os.path.join(path, name)}
+            for name in names[offset:offset + limit]
+        ],
+    }
 
 
 @PromptServer.instance.routes.post("/image_anything/pick-folder")
@@ -106,14 +203,39 @@ async def pick_folder(request: web.Request) -> web.Response:
         except Exception:
             payload = {}
 
+    global _picker_busy
+    if _picker_busy:
+        return web.json_response(
+            {
+                "status": "busy",
+                "message": "A folder picker is already open. Close it or cancel it first.",
+            },
+            status=409,
+        )
+
     initial_path = _normalize_initial_path(
         payload.get("initial_path"),
         payload.get("directory_type"),
     )
 
     try:
-        async with _PICKER_LOCK:
-            selected_path = await _run_picker(initial_path)
+        timeout = float(payload.get("timeout", DEFAULT_PICKER_TIMEOUT))
+    except (TypeError, ValueError):
+        timeout = DEFAULT_PICKER_TIMEOUT
+    timeout = max(1.0, min(timeout, MAX_PICKER_TIMEOUT))
+
+    _picker_busy = True
+    try:
+        selected_path = await _run_picker(initial_path, timeout)
+    except PickerCancelled:
+        return web.json_response({"status": "cancelled"})
+    except subprocess.TimeoutExpired:
+        return web.json_response(
+            {
+                "status": "timeout",
+                "message": f"Folder picker closed after {int(timeout)}s without a selection.",
+            }
+        )
     except Exception as exc:
         return web.json_response(
             {
@@ -122,6 +244,8 @@ async def pick_folder(request: web.Request) -> web.Response:
             },
             status=500,
         )
+    finally:
+        _picker_busy = False
 
     if not selected_path:
         return web.json_response({"status": "cancelled"})
@@ -132,3 +256,55 @@ async def pick_folder(request: web.Request) -> web.Response:
             "path": os.path.abspath(selected_path),
         }
     )
+
+
+@PromptServer.instance.routes.post("/image_anything/pick-folder/cancel")
+async def cancel_pick_folder(request: web.Request) -> web.Response:
+    with _PICKER_PROCESS_LOCK:
+        process = _picker_process
+        if process is not None:
+            _PICKER_CANCELLED.set()
+            process.terminate()
+
+    return web.json_response({"status": "cancelled" if process is not None else "idle"})
+
+
+@PromptServer.instance.routes.get("/image_anything/list-dirs")
+async def list_dirs(request: web.Request) -> web.Response:
+    query = request.rel_url.query
+    path = _normalize_initial_path(query.get("path"), query.get("directory_type"))
+    roots = _get_list_roots()
+    if not _is_listable(path, roots):
+        return web.json_response(
+            {
+                "status": "error",
+                "message": "Path is outside the input, output and user directories.",
+            },
+            status=403,
+        )
+
+    try:
+        offset = max(0, int(query.get("offset", 0)))
+        limit = max(1, min(int(query.get("limit", DEFAULT_LIST_LIMIT)), MAX_LIST_LIMIT))
+    except ValueError:
+        return web.json_response(
+            {
+                "status": "error",
+                "message": "offset and limit must be integers.",
+            },
+            status=400,
+        )
+
+    loop = asyncio.get_running_loop()
+    try:
+        listing = await loop.run_in_executor(None, _list_directories, path, offset, limit, roots)
+    except OSError as exc:
+        return web.json_response(
+            {
+                "status": "error",
+                "message": f"Failed to list {path}: {exc}",
+            },
+            status=500,
+        )
+
+    return web.json_response(listing)
@@ -0,0 +1,200 @@
+import glob
+import json
+import os
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+
+from .atomic_io import atomic_write_text
+
+
+ARCHIVE_EXTENSIONS = (".tar", ".zip")
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 1
+
+_MAX_OPEN_ZIPS = 8
+_ARCHIVES = {}
+_SHARD_MAPS = {}
+_SORTED = {}
+_ZIP_HANDLES = OrderedDict()
+_LOCK = threading.RLock()
+
+
+def is_archive_source(source):
+    if not source or os.path.isdir(source):
+        return False
+    return source.lower().endswith(ARCHIVE_EXTENSIONS) or any(char in source for char in "*?[")
+
+
+def _archive_paths(source):
+    if os.path.isfile(source):
+        return [source]
+    return sorted(path for path in glob.glob(source) if path.lower().endswith(ARCHIVE_EXTENSIONS))
+
+
+def _is_single_archive(source):
+    return os.path.isfile(source)
+
+
+def _scan_tar(archive_path):
+    members = []
+    with tarfile.open(archive_path, "r:") as archive:
+        for member in archive:
+            if member.isfile():
+                members.append([member.name, member.offset_data, member.size, member.mtime])
+    return members
+
+
+def _scan_zip(archive_path):
+    members = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                members.append([info.filename, info.header_offset, info.file_size, 0])
+    return members
+
+
+def _load_sidecar(archive_path, stat):
+    try:
+        with open(archive_path + INDEX_SUFFIX, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if (data.get("version") != INDEX_VERSION or data.get("size") != stat.st_size
+            or data.get("mtime_ns") != stat.st_mtime_ns):
+        return None
+    return data.get("members")
+
+
+def _write_sidecar(archive_path, stat, members):
+    try:
+        atomic_write_text(archive_path + INDEX_SUFFIX, json.dumps({
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "members": members,
+        }))
+    except OSError as exc:
+        print(f"[ArchiveSource] Could not write index sidecar for {archive_path}: {exc}")
+
+
+def _get_archive(archive_path):
+    stat = os.stat(archive_path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _LOCK:
+        cached = _ARCHIVES.get(archive_path)
+        if cached is not None and cached["signature"] == signature:
+            return cached
+
+    members = _load_sidecar(archive_path, stat)
+    if members is None:
+        if archive_path.lower().endswith(".zip"):
+            members = _scan_zip(archive_path)
+        else:
+            members = _scan_tar(archive_path)
+        _write_sidecar(archive_path, stat, members)
+
+    entry = {
+        "signature": signature,
+        "kind": "zip" if archive_path.lower().endswith(".zip") else "tar",
+        "members": {member[0]: member for member in members},
+    }
+    with _LOCK:
+        _ARCHIVES[archive_path] = entry
+    return entry
+
+
+def _member_rel_path(source, archive_path, member_name):
+    rel_path = member_name.replace("/", os.sep)
+    if _is_single_archive(source):
+        return rel_path
+    shard_name = os.path.splitext(os.path.basename(archive_path))[0]
+    return os.path.join(shard_name, rel_path)
+
+
+def list_archive_files(source, extensions, sort_by="name_asc"):
+    entries = []
+    signatures = []
+    shard_map = {}
+    for archive_path in _archive_paths(source):
+        archive = _get_archive(archive_path)
+        signatures.append((archive_path, archive["signature"]))
+        shard_map[os.path.splitext(os.path.basename(archive_path))[0]] = archive_path
+        for member_name, member in archive["members"].items():
+            if os.path.splitext(member_name)[1].lower() in extensions:
+                entries.append((_member_rel_path(source, archive_path, member_name), member[3]))
+
+    cache_key = (source, sort_by, frozenset(extensions))
+    with _LOCK:
+        _SHARD_MAPS[source] = shard_map
+        cached = _SORTED.get(cache_key)
+        if cached is not None and cached[0] == signatures:
+            return cached[1]
+
+    if sort_by in ("modified_asc", "modified_desc"):
+        entries.sort(key=lambda entry: entry[1], reverse=sort_by == "modified_desc")
+    else:
+        entries.sort(key=lambda entry: entry[0], reverse=sort_by == "name_desc")
+
+    files = [rel_path for rel_path, _mtime in entries]
+    with _LOCK:
+        _SORTED[cache_key] = (signatures, files)
+    return files
+
+
+def _resolve_member(source, rel_path):
+    if _is_single_archive(source):
+        return source, rel_path.replace(os.sep, "/")
+
+    shard_name, _, member_path = rel_path.partition(os.sep)
+    with _LOCK:
+        archive_path = _SHARD_MAPS.get(source, {}).get(shard_name)
+    if archive_path is None:
+        list_archive_files(source, ())
+        with _LOCK:
+            archive_path = _SHARD_MAPS.get(source, {}).get(shard_name)
+    if archive_path is None:
+        raise FileNotFoundError(f"No archive shard named '{shard_name}' in {source}")
+    return archive_path, member_path.replace(os.sep, "/")
+
+
+def _get_zip_handle(archive_path):
+    with _LOCK:
+        handle = _ZIP_HANDLES.get(archive_path)
+        if handle is None:
+            handle = zipfile.ZipFile(archive_path)
+            _ZIP_HANDLES[archive_path] = handle
+            while len(_ZIP_HANDLES) > _MAX_OPEN_ZIPS:
+                _ZIP_HANDLES.popitem(last=False)[1].close()
+        else:
+            _ZIP_HANDLES.move_to_end(archive_path)
+        return handle
+
+
+def read_archive_member(source, rel_path):
+    archive_path, member_name = _resolve_member(source, rel_path)
+    archive = _get_archive(archive_path)
+    member = archive["members"].get(member_name)
+    if member is None:
+        raise FileNotFoundError(f"'{member_name}' not found in {archive_path}")
+
+    if archive["kind"] == "zip":
+        with _LOCK:
+            return _get_zip_handle(archive_path).read(member_name)
+
+    _name, offset, size, _mtime = member
+    with open(archive_path, "rb") as handle:
+        handle.seek(offset)
+        return handle.read(size)
+
+
+def invalidate_archive_source(source):
+    with _LOCK:
+        for archive_path in _archive_paths(source):
+            _ARCHIVES.pop(archive_path, None)
+            handle = _ZIP_HANDLES.pop(archive_path, None)
+            if handle is not None:
+                handle.close()
+        for key in [key for key in _SORTED if key[0] == source]:
+            del _SORTED[key]
@@ -0,0 +1,94 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+VERIFY_MAX_WORKERS = 8
+_TRAILER_BYTES = 64
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+def temp_path_for(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+
+def is_temp_file(name):
+    return name.startswith(".") and name.endswith(".tmp")
+
+
+def _fsync_path(path, directory=False):
+    flags = os.O_RDONLY
+    if directory:
+        if os.name == "nt":
+            return
+        flags |= getattr(os, "O_DIRECTORY", 0)
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, write, fsync=False):
+    temp_path = temp_path_for(path)
+    try:
+        write(temp_path)
+        if fsync:
+            _fsync_path(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync:
+        _fsync_path(os.path.dirname(path) or ".", directory=True)
+
+
+def atomic_write_bytes(path, data, fsync=False):
+    def write(temp_path):
+        with open(temp_path, "wb") as handle:
+            handle.write(data)
+
+    atomic_write(path, write, fsync=fsync)
+
+
+def atomic_write_text(path, text, fsync=False):
+    atomic_write_bytes(path, text.encode("utf-8"), fsync=fsync)
+
+
+def is_intact_output(path):
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            return False
+        if extension not in (".png", ".jpg", ".jpeg", ".webp"):
+            return True
+
+        with open(path, "rb") as handle:
+            header = handle.read(12)
+            handle.seek(max(0, size - _TRAILER_BYTES))
+            trailer = handle.read()
+    except OSError:
+        return False
+
+    if extension == ".png":
+        return header.startswith(_PNG_SIGNATURE) and trailer.endswith(_PNG_IEND)
+    if extension in (".jpg", ".jpeg"):
+        return header.startswith(b"\xff\xd8") and trailer.rstrip(b"\x00").endswith(b"\xff\xd9")
+    return (header[:4] == b"RIFF" and header[8:12] == b"WEBP"
+            and size >= int.from_bytes(header[4:8], "little") + 8)
+
+
+def find_damaged_outputs(paths, max_workers=VERIFY_MAX_WORKERS):
+    paths = list(paths)
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image_anything_verify") as executor:
+        results = executor.map(is_intact_output, paths, chunksize=64)
+        return [path for path, intact in zip(paths, results) if not intact]
@@ -1,8 +1,37 @@
 import comfy.model_management
 
+from .write_behind import flush_writes
+
 
 AUTO_QUEUE_STOP_EVENT = "image_anything_auto_queue_stop_requested"
 
+_EXHAUSTION_LISTENERS = []
+
+
+def add_exhaustion_listener(listener):
+    _EXHAUSTION_LISTENERS.append(listener)
+
+
+def remove_exhaustion_listener(listener):
+    if listener in _EXHAUSTION_LISTENERS:
+        _EXHAUSTION_LISTENERS.remove(listener)
+
+
+def _notify_exhausted(source, payload):
+    prompt_id = None
+    try:
+        from server import PromptServer
+
+        prompt_id = getattr(getattr(PromptServer, "instance", None), "last_prompt_id", None)
+    except Exception:
+        pass
+
+    for listener in list(_EXHAUSTION_LISTENERS):
+        try:
+            listener(source, prompt_id, payload)
+        except Exception as exc:
+            print(f"[auto_queue_control] exhaustion listener failed: {exc}")
+
 
 def request_auto_queue_stop(source, **payload):
     try:
@@ -26,6 +55,8 @@ def request_auto_queue_stop(source, **payload):
 
 
 def stop_current_iteration(source, **payload):
+    flush_writes()
+    _notify_exhausted(source, payload)
     request_auto_queue_stop(source, **payload)
     comfy.model_management.interrupt_current_processing()
     raise comfy.model_management.InterruptProcessingException()
@@ -4,8 +4,12 @@ import torch
 import numpy as np
 from PIL import Image
 import folder_paths
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from .atomic_io import atomic_write, atomic_write_text
+from .image_io import save_pil_image, tensor_to_pil_images
+
 class ImageCollector:
     """
     图片批次节点 - 用于收集一组图片及其保存名称
@@ -69,21 +73,13 @@ class ImageCollector:
                 image_tensor = kwargs[image_key]
                 save_name = kwargs.get(save_name_key, "image")
 
-                # 转换tensor为numpy数组
-                i_array = image_tensor.cpu().numpy()
-                if i_array.ndim == 4 and i_array.shape[0] == 1:
-                    i_array = i_array[0]
-
-                # 转换为PIL Image
-                i_array = 255. * i_array
-                img = Image.fromarray(np.clip(i_array, 0, 255).astype(np.uint8))
-
+                # 只保存 tensor 引用，到保存节点真正写盘时才转换为 PIL
                 collected_images.append({
-                    "image": img,
+                    "image": image_tensor,
                     "save_name": save_name,
                     "original_index": i
                 })
-                total_count += 1
+                total_count += image_tensor.shape[0] if image_tensor.ndim == 4 else 1
 
         # 构建批次数据
         batch_data = {
@@ -240,6 +236,13 @@ class BatchImageSaverV2:
                     "label_off": "Disabled",
                     "tooltip": "启用或禁用此节点"
                 }),
+                "max_workers": ("INT", {
+                    "default": 4,
+                    "min": 1,
+                    "max": 32,
+                    "step": 1,
+                    "tooltip": "并行编码图片的线程数（1 表示逐张保存）"
+                }),
                 # 初始各定义一个输入端口，其余由前端动态添加
                 "image_batch_1": ("IMAGE_BATCH", {"forceInput": True}),
                 "text_batch_1": ("TEXT_BATCH", {"forceInput": True}),
@@ -259,13 +262,14 @@ class BatchImageSaverV2:
     CATEGORY = "🚦 ComfyUI_Image_Anything/Batch_Save"
     DESCRIPTION = "支持动态输入的批量图片保存节点"
 
-    def save_batches(self, output_folder="batch_saves", enabled=True, prompt=None, extra_pnginfo=None, **kwargs):
+    def save_batches(self, output_folder="batch_saves", enabled=True, max_workers=4, prompt=None, extra_pnginfo=None, **kwargs):
         """
         批量保存多个图片批次到独立文件夹 - 支持真正的动态输入
 
         Args:
             output_folder: 输出文件夹名
             enabled: 是否启用此节点
+            max_workers: 并行编码图片的线程数
             prompt: ComfyUI 提示词元数据（自动传入）
             extra_pnginfo: ComfyUI 额外信息（自动传入）
             **kwargs: 动态包含image_batch_1-N和text_batch_1-N的批次输入
@@ -300,6 +304,7 @@ class BatchImageSaverV2:
         # 收集所有图片（重新编号）
         all_images = []
         saved_files = []
+        save_tasks = []
         global_index = 1
 
         # 动态处理所有图片批次输入
@@ -315,7 +320,7 @@ class BatchImageSaverV2:
                 batch_images = batch_data["images"]
                 batch_idx = int(key.replace("image_batch_", ""))
 
-                # 处理批次中的每张图片（重新编号）
+                # 处理批次中的每张图片（重新编号），批量 tensor 的每一帧都单独保存
                 for img_data in batch_images:
                     img = img_data["image"]
                     save_name = img_data["save_name"]
@@ -324,24 +329,26 @@ class BatchImageSaverV2:
                     # 清理保存名称
                     clean_save_name = save_name.replace('/', '_').replace('\\', '_')
 
-                    # 生成新文件名（全局编号）
-                    filename = f"{clean_save_name}_{global_index:02d}.png"
-                    filepath = os.path.join(batch_dir, filename)
-
-                    # 保存图片
-                    img.save(filepath)
-
-                    # 记录信息
-                    all_images.append({
-                        "global_index": global_index,
-                        "save_name": save_name,
-                        "filename": filename,
-                        "filepath": filepath,
-                        "source_batch": batch_idx,
-                        "source_index": original_index
-                    })
-                    saved_files.append(filepath)
-                    global_index += 1
+                    for frame_index, frame in enumerate(self._iter_frames(img)):
+                        # 生成新文件名（全局编号）
+                        filename = f"{clean_save_name}_{global_index:02d}.png"
+                        filepath = os.path.join(batch_dir, filename)
+
+                        # 先登记保存任务，编号在此确定，保证 metadata 顺序稳定
+                        save_tasks.append((frame, filepath))
+
+                        # 记录信息
+                        all_images.append({
+                            "global_index": global_index,
+                            "save_name": save_name,
+                            "filename": filename,
+                            "filepath": filepath,
+                            "source_batch": batch_idx,
+                            "source_index": original_index,
+                            "source_frame": frame_index
+                        })
+                        saved_files.append(filepath)
+                        global_index += 1
 
                 image_batch_count += 1
 
@@ -349,6 +356,9 @@ class BatchImageSaverV2:
         if not all_images:
             return ("No images to save",)
 
+        # 并行编码保存图片（PIL 编码时会释放 GIL，线程池即可利用多核）
+        self._save_images(save_tasks, max_workers)
+
         # 处理文本批次 - 动态收集所有文本文件
         text_files = []  # 存储 {content: "...", file_name: "..."} 的列表
         text_batch_count = 0
@@ -413,22 +423,61 @@ class BatchImageSaverV2:
         # 保存ComfyUI工作流文件
         if extra_pnginfo is not None and "workflow" in extra_pnginfo:
             workflow_path = os.path.join(batch_dir, "workflow.json")
-            with open(workflow_path, 'w', encoding='utf-8') as f:
-                json.dump(extra_pnginfo["workflow"], f, indent=2, ensure_ascii=False)
+            atomic_write_text(workflow_path, json.dumps(extra_pnginfo["workflow"], indent=2, ensure_ascii=False))
 
         # 保存元数据文件
         metadata_path = os.path.join(batch_dir, "metadata.json")
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        atomic_write_text(metadata_path, json.dumps(metadata, indent=2, ensure_ascii=False))
 
         # 保存文本文件
         for text_file in text_files:
             text_path = os.path.join(batch_dir, f"{text_file['file_name']}.txt")
-            with open(text_path, 'w', encoding='utf-8') as f:
-                f.write(text_file["content"])
+            atomic_write_text(text_path, text_file["content"])
 
         return (save_info,)
 
+    @staticmethod
+    def _iter_frames(img):
+        """
+        拆分收集到的图片为单帧
+
+        Args:
+            img: IMAGE tensor（可能包含多帧）或旧版收集器产生的 PIL Image
+        """
+        if isinstance(img, Image.Image):
+            return [img]
+        if img.ndim == 3:
+            return [img]
+        return list(img)
+
+    @staticmethod
+    def _save_frame(task):
+        """在工作线程中完成 tensor 到 PIL 的转换并保存"""
+        frame, filepath = task
+        if not isinstance(frame, Image.Image):
+            frame = tensor_to_pil_images(frame)[0]
+        atomic_write(filepath, lambda temp_path: save_pil_image(frame, temp_path, os.path.splitext(filepath)[1]))
+
+    @classmethod
+    def _save_images(cls, save_tasks, max_workers=4):
+        """
+        使用线程池并行保存图片
+
+        Args:
+            save_tasks: (单帧 tensor 或 PIL Image, 保存路径) 列表
+            max_workers: 最大线程数
+        """
+        worker_count = max(1, min(int(max_workers or 1), len(save_tasks)))
+        if worker_count == 1:
+            for task in save_tasks:
+                cls._save_frame(task)
+            return
+
+        with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="batch_image_saver") as executor:
+            # 遍历结果以便把任何保存异常抛回主线程
+            for _ in executor.map(cls._save_frame, save_tasks):
+                pass
+
 
 class BatchImageSaver:
     """
@@ -589,7 +638,7 @@ class BatchImageSaver:
         # 生成文件名：保存名称_序号.png
         filename = f"{clean_save_name_1}_01.png"
         filepath = os.path.join(batch_dir, filename)
-        img.save(filepath)
+        atomic_write(filepath, lambda temp_path: save_pil_image(img, temp_path, "png"))
 
         # 记录信息
         images_info.append({
@@ -632,7 +681,7 @@ class BatchImageSaver:
             # 生成文件名：保存名称_序号.png
             filename = f"{clean_save_name}_{idx:02d}.png"
             filepath = os.path.join(batch_dir, filename)
-            img.save(filepath)
+            atomic_write(filepath, lambda temp_path: save_pil_image(img, temp_path, "png"))
 
             # 记录信息
             images_info.append({
@@ -694,28 +743,23 @@ class BatchImageSaver:
         # 保存可直接加载的完整ComfyUI工作流文件
         if extra_pnginfo is not None and "workflow" in extra_pnginfo:
             workflow_path = os.path.join(batch_dir, "workflow.json")
-            with open(workflow_path, 'w', encoding='utf-8') as f:
-                json.dump(extra_pnginfo["workflow"], f, indent=2, ensure_ascii=False)
+            atomic_write_text(workflow_path, json.dumps(extra_pnginfo["workflow"], indent=2, ensure_ascii=False))
 
         metadata_path = os.path.join(batch_dir, "metadata.json")
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        atomic_write_text(metadata_path, json.dumps(metadata, indent=2, ensure_ascii=False))
 
         # 保存各个文本到对应的文件
         if title:
             title_path = os.path.join(batch_dir, "title.txt")
-            with open(title_path, 'w', encoding='utf-8') as f:
-                f.write(title)
+            atomic_write_text(title_path, title)
 
         if description:
             description_path = os.path.join(batch_dir, "description.txt")
-            with open(description_path, 'w', encoding='utf-8') as f:
-                f.write(description)
+            atomic_write_text(description_path, description)
 
         if text_prompt:
             prompt_path = os.path.join(batch_dir, "prompt.txt")
-            with open(prompt_path, 'w', encoding='utf-8') as f:
-                f.write(text_prompt)
+            atomic_write_text(prompt_path, text_prompt)
 
         # 返回文本信息
         return (save_info,)
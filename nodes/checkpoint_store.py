@@ -0,0 +1,187 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+import folder_paths
+
+
+CHECKPOINT_COMMIT_INTERVAL = 1.0
+CHECKPOINT_COMMIT_BATCH = 256
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS positions ("
+    " namespace TEXT NOT NULL, key TEXT NOT NULL, value INTEGER NOT NULL,"
+    " PRIMARY KEY (namespace, key))",
+    "CREATE TABLE IF NOT EXISTS completed_roots ("
+    " root TEXT PRIMARY KEY, scanned_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS completed ("
+    " root TEXT NOT NULL, rel_path TEXT NOT NULL,"
+    " PRIMARY KEY (root, rel_path)) WITHOUT ROWID",
+)
+
+
+class CheckpointStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._commit_timer = None
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error) as exc:
+            print(f"[CheckpointStore] Cannot open {self.path} ({exc}), keeping checkpoints in memory only.")
+            connection = sqlite3.connect(":memory:", check_same_thread=False)
+
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+        self._connection = connection
+        return connection
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            self._connect().execute(sql, parameters)
+            self._pending += 1
+            self.commit(force=False)
+            if self._pending and self._commit_timer is None:
+                self._commit_timer = threading.Timer(CHECKPOINT_COMMIT_INTERVAL, self._commit_from_timer)
+                self._commit_timer.daemon = True
+                self._commit_timer.start()
+
+    def _commit_from_timer(self):
+        with self._lock:
+            self._commit_timer = None
+            self.commit()
+
+    def commit(self, force=True):
+        with self._lock:
+            if self._connection is None or not self._pending:
+                return
+            now = time.monotonic()
+            if (not force and self._pending < CHECKPOINT_COMMIT_BATCH
+                    and now - self._last_commit < CHECKPOINT_COMMIT_INTERVAL):
+                return
+            self._connection.commit()
+            self._pending = 0
+            self._last_commit = now
+
+    def load_positions(self, namespace):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT key, value FROM positions WHERE namespace = ?", (namespace,)
+            ).fetchall()
+        return {key: value for key, value in rows}
+
+    def set_position(self, namespace, key, value):
+        self._execute(
+            "INSERT OR REPLACE INTO positions (namespace, key, value) VALUES (?, ?, ?)",
+            (namespace, key, int(value)),
+        )
+
+    def delete_position(self, namespace, key):
+        self._execute("DELETE FROM positions WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def load_completed(self, root):
+        with self._lock:
+            connection = self._connect()
+            if connection.execute("SELECT 1 FROM completed_roots WHERE root = ?", (root,)).fetchone() is None:
+                return None
+            rows = connection.execute("SELECT rel_path FROM completed WHERE root = ?", (root,)).fetchall()
+        return {rel_path for (rel_path,) in rows}
+
+    def replace_completed(self, root, rel_paths):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM completed WHERE root = ?", (root,))
+            connection.executemany(
+                "INSERT OR IGNORE INTO completed (root, rel_path) VALUES (?, ?)",
+                ((root, rel_path) for rel_path in rel_paths),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO completed_roots (root, scanned_at) VALUES (?, ?)",
+                (root, time.time()),
+            )
+            self._pending += 1
+            self.commit()
+
+    def add_completed(self, root, rel_path):
+        self._execute("INSERT OR IGNORE INTO completed (root, rel_path) VALUES (?, ?)", (root, rel_path))
+
+    def discard_completed(self, root, rel_path):
+        self._execute("DELETE FROM completed WHERE root = ? AND rel_path = ?", (root, rel_path))
+
+    def close(self):
+        with self._lock:
+            if self._connection is None:
+                return
+            self.commit()
+            self._connection.close()
+            self._connection = None
+
+
+class PersistentCounters(MutableMapping):
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._values = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._values is None:
+            with self._lock:
+                if self._values is None:
+                    self._values = get_checkpoint_store().load_positions(self.namespace)
+        return self._values
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        values = self._load()
+        if values.get(key) == value:
+            return
+        values[key] = value
+        get_checkpoint_store().set_position(self.namespace, key, value)
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        get_checkpoint_store().delete_position(self.namespace, key)
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_checkpoint_store():
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            path = os.path.join(folder_paths.get_user_directory(), "image_anything", "checkpoints.sqlite3")
+            _STORE = CheckpointStore(path)
+        return _STORE
+
+
+def _close_store():
+    if _STORE is not None:
+        _STORE.close()
+
+
+atexit.register(_close_store)
@@ -0,0 +1,129 @@
+import os
+import threading
+
+from .atomic_io import find_damaged_outputs, is_temp_file
+from .checkpoint_store import get_checkpoint_store
+from .shard_writer import load_completed_keys, sample_key
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+# Keys loaded from the checkpoint store are confirmed on disk the first time they are looked up.
+_UNVERIFIED = {}
+
+
+def _index_root(save_spec):
+    return os.path.abspath(save_spec["output_root"])
+
+
+def _is_sharded(save_spec):
+    return save_spec.get("output_mode") == "tar_shards"
+
+
+def _cache_key(save_spec):
+    return (_index_root(save_spec), save_spec.get("output_mode", "files"))
+
+
+def _relative_key(save_spec, output_path):
+    rel_path = os.path.relpath(os.path.abspath(output_path), _index_root(save_spec))
+    if _is_sharded(save_spec):
+        rel_path = sample_key(rel_path)
+    return os.path.normcase(rel_path)
+
+
+def _scan_output_root(output_root, verify=False):
+    rel_paths = []
+    if not os.path.isdir(output_root):
+        return set()
+
+    for root, _dirs, filenames in os.walk(output_root):
+        rel_root = os.path.relpath(root, output_root)
+        for filename in filenames:
+            if is_temp_file(filename):
+                continue
+            rel_paths.append(filename if rel_root == "." else os.path.join(rel_root, filename))
+
+    if verify:
+        damaged = find_damaged_outputs(os.path.join(output_root, rel_path) for rel_path in rel_paths)
+        if damaged:
+            print(f"[CompletionIndex] {len(damaged)} damaged output(s) under {output_root} will be redone.")
+            damaged = {os.path.relpath(path, output_root) for path in damaged}
+            rel_paths = [rel_path for rel_path in rel_paths if rel_path not in damaged]
+    return {os.path.normcase(rel_path) for rel_path in rel_paths}
+
+
+def get_completion_index(save_spec, refresh=False):
+    output_root = _index_root(save_spec)
+    cache_key = _cache_key(save_spec)
+    with _INDEXES_LOCK:
+        completed = _INDEXES.get(cache_key)
+        if _is_sharded(save_spec):
+            # Shard outputs are tracked by the writer's key index, no scan or checkpoint needed.
+            if completed is None or refresh:
+                completed = {os.path.normcase(key) for key in load_completed_keys(output_root)}
+                _INDEXES[cache_key] = completed
+            return completed
+
+        verify = save_spec.get("verify_existing", False)
+        if completed is None and not refresh and not verify:
+            completed = get_checkpoint_store().load_completed(output_root)
+            if completed is not None:
+                _UNVERIFIED[cache_key] = set(completed)
+        if completed is None or refresh:
+            completed = _scan_output_root(output_root, verify=verify)
+            get_checkpoint_store().replace_completed(output_root, completed)
+            _UNVERIFIED.pop(cache_key, None)
+        _INDEXES[cache_key] = completed
+        return completed
+
+
+def _exists_on_disk(output_path):
+    try:
+        return os.path.getsize(output_path) > 0
+    except OSError:
+        return False
+
+
+def is_output_complete(save_spec, output_path):
+    completed = get_completion_index(save_spec)
+    rel_path = _relative_key(save_spec, output_path)
+    if rel_path not in completed:
+        return False
+
+    with _INDEXES_LOCK:
+        unverified = _UNVERIFIED.get(_cache_key(save_spec))
+        if not unverified or rel_path not in unverified:
+            return True
+        unverified.discard(rel_path)
+    if _exists_on_disk(output_path):
+        return True
+
+    print(f"[CompletionIndex] {output_path} is recorded as complete but missing on disk, redoing it.")
+    discard_output(save_spec, output_path)
+    return False
+
+
+def mark_output_complete(save_spec, output_path, persist=True):
+    output_root = _index_root(save_spec)
+    with _INDEXES_LOCK:
+        completed = _INDEXES.get(_cache_key(save_spec))
+        rel_path = _relative_key(save_spec, output_path)
+        if completed is not None:
+            completed.add(rel_path)
+        unverified = _UNVERIFIED.get(_cache_key(save_spec))
+        if unverified is not None:
+            unverified.discard(rel_path)
+        # Only outputs already renamed into place are persisted; queued writes stay in memory.
+        if persist and not _is_sharded(save_spec):
+            get_checkpoint_store().add_completed(output_root, rel_path)
+
+
+def discard_output(save_spec, output_path):
+    output_root = _index_root(save_spec)
+    with _INDEXES_LOCK:
+        completed = _INDEXES.get(_cache_key(save_spec))
+        rel_path = _relative_key(save_spec, output_path)
+        if completed is not None:
+            completed.discard(rel_path)
+        if not _is_sharded(save_spec):
+            get_checkpoint_store().discard_completed(output_root, rel_path)
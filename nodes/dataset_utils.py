@@ -1,5 +1,8 @@
 import fnmatch
+import io
 import os
+import threading
+import time
 from datetime import datetime
 
 import numpy as np
@@ -7,16 +10,137 @@ import torch
 from PIL import Image, ImageOps
 
 from .auto_queue_control import stop_current_iteration
+from .atomic_io import atomic_write, atomic_write_text, find_damaged_outputs
+from .checkpoint_store import PersistentCounters
+from .completion_index import discard_output, get_completion_index, mark_output_complete
+from .image_io import limit_image_size, open_image, pil_to_tensor, save_pil_image
+from .manifest_source import get_manifest, get_manifest_column, get_manifest_root
 from .save_resolver import (
     build_output_path,
-    normalize_extension,
+    is_processing_complete,
     normalize_save_spec,
+    resolve_existing_output,
 )
+from .shard_writer import write_shard_sample
+from .work_lease import release_lease, try_claim_lease
+from .write_behind import is_write_pending, submit_write
+
+
+_LOADER_COUNTERS = PersistentCounters("edit_dataset_loader")
+_SAVER_COUNTER_LOCK = threading.Lock()
+_SAVER_COUNTER_LOCK_TTL = 30
+# Spec-driven saves used save_format before they followed the spec, so finished samples may be in any of these.
+_LEGACY_SAVE_SPEC_IMAGE_FORMATS = ("png", "jpg", "webp")
+_DATASET_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"}
+_PAIRING_INDEXES = {}
+_PAIRING_INDEXES_LOCK = threading.Lock()
+
+
+def _output_exists(path):
+    return os.path.exists(path) or is_write_pending(path)
+
+
+def _scan_saver_index(filename_prefix, folders):
+    max_idx = -1
+    for folder in folders:
+        if not os.path.exists(folder):
+            continue
+        for existing_name in os.listdir(folder):
+            if not existing_name.startswith(filename_prefix):
+                continue
+            remain = os.path.splitext(existing_name)[0][len(filename_prefix):]
+            if remain.startswith("_") and remain[1:].isdigit():
+                max_idx = max(max_idx, int(remain[1:]))
+    return max_idx + 1
+
+
+def _read_saver_counter(counter_path):
+    try:
+        with open(counter_path, "r", encoding="utf-8") as handle:
+            return int(handle.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _next_saver_index(output_root, filename_prefix, folders, reconcile=False):
+    counter_path = os.path.join(output_root, f".{filename_prefix}.counter")
+    with _SAVER_COUNTER_LOCK:
+        deadline = time.monotonic() + _SAVER_COUNTER_LOCK_TTL
+        while not try_claim_lease(counter_path, _SAVER_COUNTER_LOCK_TTL):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"EditDatasetSaver: Timed out waiting for counter lock on {counter_path}")
+            time.sleep(0.05)
+
+        try:
+            current_idx = None if reconcile else _read_saver_counter(counter_path)
+            if current_idx is None:
+                current_idx = _scan_saver_index(filename_prefix, folders)
+                print(f"EditDatasetSaver: Counter for '{filename_prefix}' seeded from disk at {current_idx}.")
+            atomic_write_text(counter_path, f"{current_idx + 1}\n")
+            return current_idx
+        finally:
+            release_lease(counter_path)
+
+
+def _build_pairing_index(input_dir, target_img_suffix, control_img_suffix):
+    all_files = os.listdir(input_dir)
+    images_by_stem = {}
+    captions_by_stem = {}
+    for name in all_files:
+        stem, extension = os.path.splitext(name)
+        extension = extension.lower()
+        if extension in _DATASET_IMAGE_EXTENSIONS:
+            images_by_stem.setdefault(stem, name)
+        elif extension == ".txt":
+            captions_by_stem[stem] = name
+
+    if target_img_suffix:
+        candidates = fnmatch.filter(all_files, f"*{target_img_suffix}.*")
+    else:
+        candidates = all_files
+    files = sorted(name for name in candidates if os.path.splitext(name)[1].lower() in _DATASET_IMAGE_EXTENSIONS)
+
+    pairs = {}
+    unpaired = []
+    for filename in files:
+        target_stem = os.path.splitext(filename)[0]
+        stem = EditDatasetLoader._build_filename_stem(filename, target_img_suffix)
+        control = None
+        if target_img_suffix and control_img_suffix:
+            control_stem = os.path.splitext(filename.replace(target_img_suffix, control_img_suffix))[0]
+            control = images_by_stem.get(control_stem)
+            if control is None:
+                unpaired.append(filename)
+        pairs[stem] = {
+            "target": filename,
+            "control": control,
+            "caption": captions_by_stem.get(target_stem) or captions_by_stem.get(stem),
+        }
+
+    if unpaired:
+        preview = ", ".join(unpaired[:5]) + (" ..." if len(unpaired) > 5 else "")
+        print(f"EditDatasetLoader: {len(unpaired)} target image(s) in {input_dir} have no control image "
+              f"(suffix '{control_img_suffix}'): {preview}")
+    return {"files": files, "pairs": pairs}
+
+
+def _get_pairing_index(input_dir, target_img_suffix="", control_img_suffix=""):
+    mtime_ns = os.stat(input_dir).st_mtime_ns
+    key = (input_dir, target_img_suffix, control_img_suffix)
+    with _PAIRING_INDEXES_LOCK:
+        cached = _PAIRING_INDEXES.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        index = _build_pairing_index(input_dir, target_img_suffix, control_img_suffix)
+        _PAIRING_INDEXES[key] = (mtime_ns, index)
+        return index
 
 
-_LOADER_COUNTERS = {}
-_SAVER_COUNTERS = {}
-_SAVE_SPEC_IMAGE_FORMATS = ("png", "jpg", "webp")
+def _invalidate_pairing_index(input_dir):
+    with _PAIRING_INDEXES_LOCK:
+        for key in [key for key in _PAIRING_INDEXES if key[0] == input_dir]:
+            del _PAIRING_INDEXES[key]
 
 
 class EditDatasetLoader:
@@ -52,11 +176,26 @@ class EditDatasetLoader:
                     "forceInput": True,
                     "tooltip": "Optional shared save rules. Completed outputs are skipped automatically.",
                 }),
+                "max_side": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 16384,
+                    "step": 8,
+                    "tooltip": "Downscale while decoding so the longest side is at most this many pixels. "
+                               "JPEGs are decoded directly at reduced size. 0 keeps the full resolution.",
+                }),
+                "manifest_path": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Optional CSV/JSONL/Parquet manifest with 'path' and optional 'control' and 'caption' "
+                               "columns. Replaces the folder scan; paths are relative to input_dir, or to the "
+                               "manifest's folder when input_dir is empty.",
+                }),
             },
         }
 
-    RETURN_TYPES = ("IMAGE", "IMAGE", "STRING", "STRING", "INT")
-    RETURN_NAMES = ("control_img", "target_img", "filename_stem", "directory", "current_index")
+    RETURN_TYPES = ("IMAGE", "IMAGE", "STRING", "STRING", "INT", "STRING")
+    RETURN_NAMES = ("control_img", "target_img", "filename_stem", "directory", "current_index", "caption")
     FUNCTION = "load_data"
     CATEGORY = "\U0001F6A6 ComfyUI_Image_Anything/Edit_Image"
 
@@ -80,9 +219,11 @@ class EditDatasetLoader:
     def _iter_expected_outputs(filename_stem, save_spec):
         if save_spec is None:
             return []
+        if save_spec["output_mode"] == "tar_shards":
+            return [build_output_path(save_spec, filename_stem)]
 
         outputs = []
-        for file_ext in _SAVE_SPEC_IMAGE_FORMATS:
+        for file_ext in dict.fromkeys((save_spec["file_ext"],) + _LEGACY_SAVE_SPEC_IMAGE_FORMATS):
             outputs.append(build_output_path(save_spec, filename_stem, leaf_dir="target_images", file_ext=file_ext))
             outputs.append(build_output_path(save_spec, filename_stem, leaf_dir="control_images", file_ext=file_ext))
         outputs.append(build_output_path(save_spec, filename_stem, leaf_dir="target_images", file_ext="txt"))
@@ -90,30 +231,37 @@ class EditDatasetLoader:
 
     @classmethod
     def _is_completed(cls, filename_stem, save_spec):
-        return any(os.path.exists(path) for path in cls._iter_expected_outputs(filename_stem, save_spec))
+        return any(
+            is_processing_complete(path, save_spec) for path in cls._iter_expected_outputs(filename_stem, save_spec)
+        )
 
     def load_data(self, input_dir, start_index, auto_next, reset_iterator,
-                  index_list="", target_img_suffix="", control_img_suffix="", save_spec=None):
+                  index_list="", target_img_suffix="", control_img_suffix="", save_spec=None, max_side=0,
+                  manifest_path=""):
         global _LOADER_COUNTERS
 
+        manifest_path = (manifest_path or "").strip()
+        if manifest_path:
+            if not os.path.isfile(manifest_path):
+                print(f"EditDatasetLoader: Manifest {manifest_path} not found.")
+                stop_current_iteration("EditDatasetLoader", input_dir=input_dir, reason="manifest_not_found")
+            input_dir = get_manifest_root(manifest_path, input_dir)
+
         if not os.path.exists(input_dir):
             print(f"EditDatasetLoader: Directory {input_dir} not found.")
-            return self._empty_result(input_dir=input_dir)
-
-        valid_extensions = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"}
-        all_files = os.listdir(input_dir)
+            stop_current_iteration("EditDatasetLoader", input_dir=input_dir, reason="input_dir_not_found")
 
-        if target_img_suffix:
-            search_pattern = f"*{target_img_suffix}.*"
-            filtered_files = fnmatch.filter(all_files, search_pattern)
-            files = [name for name in filtered_files if os.path.splitext(name)[1].lower() in valid_extensions]
+        pairing = None
+        if reset_iterator:
+            _invalidate_pairing_index(input_dir)
+        if manifest_path:
+            files = get_manifest_column(manifest_path, "path")
         else:
-            files = [name for name in all_files if os.path.splitext(name)[1].lower() in valid_extensions]
-
-        files.sort()
+            pairing = _get_pairing_index(input_dir, target_img_suffix, control_img_suffix)
+            files = pairing["files"]
         if not files:
-            print(f"EditDatasetLoader: No images found in {input_dir} (Suffix: {target_img_suffix})")
-            return self._empty_result(input_dir=input_dir)
+            print(f"EditDatasetLoader: No images found in {manifest_path or input_dir} (Suffix: {target_img_suffix})")
+            stop_current_iteration("EditDatasetLoader", input_dir=input_dir, reason="no_images", total_count=0)
 
         target_indices = None
         if index_list and index_list.strip():
@@ -126,12 +274,16 @@ class EditDatasetLoader:
                 target_indices = None
 
         key = f"{input_dir}_list_{index_list}" if target_indices else input_dir
+        if manifest_path:
+            key = f"{key}_manifest_{manifest_path}"
         if reset_iterator or key not in _LOADER_COUNTERS:
             _LOADER_COUNTERS[key] = 0 if target_indices else start_index
             if reset_iterator:
                 print(f"EditDatasetLoader: Iterator reset for {input_dir}")
 
         spec = normalize_save_spec(save_spec) if save_spec is not None else None
+        if spec is not None and reset_iterator:
+            get_completion_index(spec, refresh=True)
 
         final_index = None
         current_stem = ""
@@ -158,16 +310,28 @@ class EditDatasetLoader:
                     if auto_next:
                         _LOADER_COUNTERS[key] += 1
                         continue
-                    return self._empty_result(input_dir=input_dir, current_index=candidate_index)
+                    stop_current_iteration(
+                        "EditDatasetLoader",
+                        input_dir=input_dir,
+                        iteration_mode="fixed_index",
+                        total_count=len(files),
+                        current_index=candidate_index,
+                    )
 
                 candidate_filename = files[candidate_index]
-                candidate_stem = self._build_filename_stem(candidate_filename, target_img_suffix)
+                candidate_stem = self._build_filename_stem(os.path.basename(candidate_filename), target_img_suffix)
                 if self._is_completed(candidate_stem, spec):
                     print(f"EditDatasetLoader: Skipping completed sample {candidate_stem} (index {candidate_index}).")
                     if auto_next:
                         _LOADER_COUNTERS[key] += 1
                         continue
-                    return self._empty_result(input_dir=input_dir, current_index=candidate_index)
+                    stop_current_iteration(
+                        "EditDatasetLoader",
+                        input_dir=input_dir,
+                        iteration_mode="fixed_index",
+                        total_count=len(files),
+                        current_index=candidate_index,
+                    )
 
                 final_index = candidate_index
                 filename = candidate_filename
@@ -190,13 +354,19 @@ class EditDatasetLoader:
                     )
 
                 candidate_filename = files[candidate_index]
-                candidate_stem = self._build_filename_stem(candidate_filename, target_img_suffix)
+                candidate_stem = self._build_filename_stem(os.path.basename(candidate_filename), target_img_suffix)
                 if self._is_completed(candidate_stem, spec):
                     print(f"EditDatasetLoader: Skipping completed sample {candidate_stem} (index {candidate_index}).")
                     if auto_next:
                         _LOADER_COUNTERS[key] += 1
                         continue
-                    return self._empty_result(input_dir=input_dir, current_index=candidate_index)
+                    stop_current_iteration(
+                        "EditDatasetLoader",
+                        input_dir=input_dir,
+                        iteration_mode="fixed_index",
+                        total_count=len(files),
+                        current_index=candidate_index,
+                    )
 
                 final_index = candidate_index
                 filename = candidate_filename
@@ -213,39 +383,41 @@ class EditDatasetLoader:
             else:
                 print(f"EditDatasetLoader: Processed {current_stem} ({final_index}). Next: {final_index + 1}")
 
-        tensor = self._load_img(image_path)
+        tensor = self._load_img(image_path, max_side)
         control_tensor = self._empty_image()
+        caption = ""
+
+        if manifest_path:
+            row = get_manifest(manifest_path).row(final_index)
+            caption = str(row.get("caption") or "")
+            control_rel_path = str(row.get("control") or "").replace("/", os.sep)
+            if control_rel_path:
+                control_tensor = self._load_img(os.path.join(input_dir, control_rel_path), max_side)
+        else:
+            pair = pairing["pairs"].get(current_stem, {})
+            if pair.get("control"):
+                control_tensor = self._load_img(os.path.join(input_dir, pair["control"]), max_side)
+            if pair.get("caption"):
+                caption = self._read_caption(os.path.join(input_dir, pair["caption"]))
 
-        if target_img_suffix and control_img_suffix:
-            if target_img_suffix in filename:
-                target_filename_base = filename.replace(target_img_suffix, control_img_suffix)
-                target_stem = os.path.splitext(target_filename_base)[0]
-                match_file = None
-
-                for candidate in os.listdir(input_dir):
-                    if candidate.startswith(target_stem) and os.path.splitext(candidate)[1].lower() in valid_extensions:
-                        if os.path.splitext(candidate)[0] == target_stem:
-                            match_file = candidate
-                            break
-
-                if match_file:
-                    control_tensor = self._load_img(os.path.join(input_dir, match_file))
-                else:
-                    print(f"EditDatasetLoader: Control file for {filename} not found (Target component: {target_stem})")
-            else:
-                print(f"EditDatasetLoader: target suffix '{target_img_suffix}' not found in filename '{filename}'")
+        return (control_tensor, tensor, current_stem, input_dir, final_index, caption)
 
-        return (control_tensor, tensor, current_stem, input_dir, final_index)
+    def _read_caption(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                return handle.read().strip()
+        except Exception as exc:
+            print(f"Error loading caption {path}: {exc}")
+            return ""
 
-    def _load_img(self, path):
+    def _load_img(self, path, max_side=0):
         if not path or not os.path.exists(path):
             return self._empty_image()
         try:
-            image = Image.open(path)
+            image = open_image(path, max_side)
             image = ImageOps.exif_transpose(image)
-            image = image.convert("RGB")
-            array = np.array(image).astype(np.float32) / 255.0
-            return torch.from_numpy(array)[None,]
+            image = limit_image_size(image, max_side)
+            return pil_to_tensor(image).unsqueeze(0)
         except Exception as exc:
             print(f"Error loading {path}: {exc}")
             return self._empty_image()
@@ -253,9 +425,6 @@ class EditDatasetLoader:
     def _empty_image(self):
         return torch.zeros((1, 512, 512, 3), dtype=torch.float32)
 
-    def _empty_result(self, input_dir="", current_index=-1):
-        return (self._empty_image(), self._empty_image(), "", input_dir, current_index)
-
 
 class EditDatasetSaver:
     def __init__(self):
@@ -275,12 +444,26 @@ class EditDatasetSaver:
                 "save_image_control": ("IMAGE",),
                 "save_image_target": ("IMAGE",),
                 "save_caption": ("STRING", {"forceInput": True}),
-                "save_format": (["jpg", "png", "webp"],),
+                "save_format": (["jpg", "png", "webp"], {
+                    "tooltip": "Image format without save_spec. A connected save_spec uses its own file format.",
+                }),
                 "output_dir": ("STRING", {"forceInput": True, "tooltip": "Optional: Override output_root with this path"}),
                 "save_spec": ("ITERATOR_SAVE_SPEC", {
                     "forceInput": True,
                     "tooltip": "Optional shared save rules. When connected, use Keep Original naming.",
                 }),
+                "write_mode": (["sync", "background"], {
+                    "default": "sync",
+                    "tooltip": "Background encodes and writes images on a worker pool so the next run can start. "
+                               "Write errors are reported on a later save.",
+                }),
+                "reconcile_counter": ("BOOLEAN", {
+                    "default": False,
+                    "label_on": "Rescan Counter",
+                    "label_off": "Use Saved Counter",
+                    "tooltip": "Rename mode keeps its next index in .<prefix>.counter under the output root. "
+                               "Enable to recompute it from the files on disk.",
+                }),
             },
         }
 
@@ -291,7 +474,8 @@ class EditDatasetSaver:
 
     def save_dataset(self, output_root, naming_style, filename_prefix, allow_overwrite,
                      filename_stem="", save_image_control=None, save_image_target=None, save_caption=None,
-                     save_format="jpg", output_dir=None, save_spec=None):
+                     save_format="jpg", output_dir=None, save_spec=None, write_mode="sync",
+                     reconcile_counter=False):
         if save_spec is not None:
             return self._save_with_spec(
                 save_spec=save_spec,
@@ -300,7 +484,7 @@ class EditDatasetSaver:
                 save_image_control=save_image_control,
                 save_image_target=save_image_target,
                 save_caption=save_caption,
-                save_format=save_format,
+                write_mode=write_mode,
             )
 
         if output_dir and output_dir.strip():
@@ -316,28 +500,10 @@ class EditDatasetSaver:
         os.makedirs(target_dir, exist_ok=True)
 
         if naming_style == "Rename (Prefix + Auto-Inc)":
-            global _SAVER_COUNTERS
-            key = f"{output_root}_{filename_prefix}"
-            if key not in _SAVER_COUNTERS:
-                max_idx = -1
-                for folder in (control_dir, target_dir):
-                    if not os.path.exists(folder):
-                        continue
-                    for existing_name in os.listdir(folder):
-                        if not existing_name.startswith(filename_prefix):
-                            continue
-                        try:
-                            base_name = os.path.splitext(existing_name)[0]
-                            remain = base_name[len(filename_prefix):]
-                            if remain.startswith("_") and remain[1:].isdigit():
-                                max_idx = max(max_idx, int(remain[1:]))
-                        except Exception:
-                            continue
-                _SAVER_COUNTERS[key] = max_idx + 1
-
-            current_idx = _SAVER_COUNTERS[key]
+            current_idx = _next_saver_index(
+                output_root, filename_prefix, (control_dir, target_dir), reconcile=reconcile_counter
+            )
             final_name = f"{filename_prefix}_{current_idx:04d}"
-            _SAVER_COUNTERS[key] += 1
         else:
             final_name = filename_stem.strip() if filename_stem else f"unknown_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
 
@@ -353,29 +519,28 @@ class EditDatasetSaver:
         if save_caption is not None:
             paths_to_check.append(caption_path)
 
-        if not allow_overwrite and any(os.path.exists(path) for path in paths_to_check):
+        if not allow_overwrite and any(_output_exists(path) for path in paths_to_check):
             print(f"EditDatasetSaver: Skipping existing sample {final_name}.")
             return {}
 
         print(f"EditDatasetSaver: Saving {final_name} (Style: {naming_style})...")
 
         if save_image_control is not None:
-            self._save_image(save_image_control, control_path)
+            self._save_image(save_image_control, control_path, write_mode)
 
         if save_image_target is not None:
-            self._save_image(save_image_target, target_path)
+            self._save_image(save_image_target, target_path, write_mode)
 
         if save_caption is not None:
             try:
-                with open(caption_path, "w", encoding="utf-8") as handle:
-                    handle.write(save_caption)
+                atomic_write_text(caption_path, save_caption)
             except Exception as exc:
                 print(f"Error saving caption {caption_path}: {exc}")
 
         return {}
 
     def _save_with_spec(self, save_spec, naming_style, filename_stem,
-                        save_image_control=None, save_image_target=None, save_caption=None, save_format="jpg"):
+                        save_image_control=None, save_image_target=None, save_caption=None, write_mode="sync"):
         spec = normalize_save_spec(save_spec)
         if naming_style != "Keep Original":
             raise ValueError("Processed Image Check only supports 'Keep Original' naming in EditDatasetSaver.")
@@ -384,8 +549,13 @@ class EditDatasetSaver:
         if not final_name:
             raise ValueError("filename_stem is required when using save_spec in EditDatasetSaver.")
 
-        target_path = build_output_path(spec, final_name, leaf_dir="target_images", file_ext=save_format)
-        control_path = build_output_path(spec, final_name, leaf_dir="control_images", file_ext=save_format)
+        if spec["output_mode"] == "tar_shards":
+            return self._save_to_shard(
+                spec, final_name, save_image_control, save_image_target, save_caption
+            )
+
+        target_path = build_output_path(spec, final_name, leaf_dir="target_images")
+        control_path = build_output_path(spec, final_name, leaf_dir="control_images")
         caption_path = os.path.splitext(target_path)[0] + ".txt"
 
         requested_paths = []
@@ -396,54 +566,95 @@ class EditDatasetSaver:
         if save_caption is not None:
             requested_paths.append(caption_path)
 
-        if spec["exists_policy"] == "skip" and requested_paths and all(os.path.exists(path) for path in requested_paths):
+        if (spec["exists_policy"] == "skip" and requested_paths
+                and all(_output_exists(path) for path in requested_paths)
+                and not (spec["verify_existing"] and find_damaged_outputs(requested_paths))):
             print(f"EditDatasetSaver: Skipping completed sample {final_name}.")
             return {}
 
         if spec["exists_policy"] == "error":
             for path in requested_paths:
-                if os.path.exists(path):
+                if _output_exists(path):
                     raise FileExistsError(f"Output already exists: {path}")
 
         if save_image_control is not None:
-            self._save_image(save_image_control, control_path)
+            self._save_image(save_image_control, control_path, write_mode, spec=spec)
 
         if save_image_target is not None:
-            self._save_image(save_image_target, target_path)
+            self._save_image(save_image_target, target_path, write_mode, spec=spec)
 
         if save_caption is not None:
             os.makedirs(os.path.dirname(caption_path), exist_ok=True)
-            with open(caption_path, "w", encoding="utf-8") as handle:
-                handle.write(save_caption)
+            atomic_write_text(caption_path, save_caption, fsync=spec["fsync"])
+            mark_output_complete(spec, caption_path)
 
         print(f"EditDatasetSaver: Saved {final_name} via shared save_spec.")
         return {}
 
-    def _save_image(self, tensor, path):
+    def _save_to_shard(self, spec, final_name, save_image_control=None, save_image_target=None,
+                       save_caption=None):
+        sample_path = build_output_path(spec, final_name)
+        action = resolve_existing_output(
+            sample_path, spec["exists_policy"], exists=is_processing_complete(sample_path, spec)
+        )
+        if action == "skip":
+            print(f"EditDatasetSaver: Skipping completed sample {final_name}.")
+            return {}
+
+        extension = spec["file_ext"]
+        members = {}
+        for role, tensor in (("control", save_image_control), ("target", save_image_target)):
+            if tensor is None:
+                continue
+            buffer = io.BytesIO()
+            self._encode_image(tensor, buffer, f"{role}.{extension}", spec["encoder"])
+            members[f"{role}.{extension}"] = buffer.getvalue()
+        if save_caption is not None:
+            members["txt"] = save_caption.encode("utf-8")
+
+        if not members:
+            return {}
+
+        shard_sample = write_shard_sample(spec, sample_path, members)
+        mark_output_complete(spec, sample_path)
+        print(f"EditDatasetSaver: Saved {final_name} to shard sample {shard_sample}.")
+        return {}
+
+    def _save_image(self, tensor, path, write_mode="sync", spec=None):
+        profile = spec["encoder"] if spec is not None else None
+        fsync = spec["fsync"] if spec is not None else False
+        if write_mode == "background":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            on_error = None
+            on_success = None
+            if spec is not None:
+                mark_output_complete(spec, path, persist=False)
+                on_error = lambda: discard_output(spec, path)
+                on_success = lambda: mark_output_complete(spec, path)
+            try:
+                submit_write(
+                    path,
+                    lambda temp_path: self._encode_image(tensor, temp_path, path, profile),
+                    on_error=on_error,
+                    on_success=on_success,
+                    fsync=fsync,
+                )
+            except Exception:
+                if on_error is not None:
+                    on_error()
+                raise
+            return
+
         try:
             os.makedirs(os.path.dirname(path), exist_ok=True)
-            img_tensor = tensor[0]
-            array = 255.0 * img_tensor.cpu().numpy()
-            image = Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
-
-            extension = normalize_extension(os.path.splitext(path)[1]).lstrip(".")
-            format_name = {
-                "png": "PNG",
-                "jpg": "JPEG",
-                "jpeg": "JPEG",
-                "webp": "WEBP",
-            }.get(extension, "PNG")
-
-            save_kwargs = {}
-            if format_name == "JPEG":
-                if image.mode not in ("RGB", "L"):
-                    image = image.convert("RGB")
-                save_kwargs["quality"] = 95
-            elif format_name == "WEBP":
-                save_kwargs["quality"] = 95
-            elif format_name == "PNG":
-                save_kwargs["optimize"] = True
-
-            image.save(path, format=format_name, **save_kwargs)
+            atomic_write(path, lambda temp_path: self._encode_image(tensor, temp_path, path, profile), fsync=fsync)
+            if spec is not None:
+                mark_output_complete(spec, path)
         except Exception as exc:
             print(f"Error saving image {path}: {exc}")
+
+    def _encode_image(self, tensor, write_path, path, profile=None):
+        img_tensor = tensor[0]
+        array = 255.0 * img_tensor.cpu().numpy()
+        image = Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
+        save_pil_image(image, write_path, os.path.splitext(path)[1], profile)
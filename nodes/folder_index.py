@@ -0,0 +1,157 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+_MAX_INDEXES = 8
+_INDEXES = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+class FolderIndex:
+    def __init__(self, folder_path, recursive, extensions):
+        self.folder_path = folder_path
+        self.recursive = recursive
+        self.extensions = extensions
+        self._lock = threading.Lock()
+        self._dirs = {}
+        self._mtimes = {}
+        self._sorted = {}
+
+    def _abs_dir(self, rel_dir):
+        return os.path.join(self.folder_path, rel_dir) if rel_dir else self.folder_path
+
+    def _drop_dir(self, rel_dir):
+        entry = self._dirs.pop(rel_dir, None)
+        if entry is None:
+            return
+        _mtime_ns, files, subdirs = entry
+        for filename in files:
+            self._mtimes.pop(os.path.join(rel_dir, filename) if rel_dir else filename, None)
+        for subdir in subdirs:
+            self._drop_dir(os.path.join(rel_dir, subdir) if rel_dir else subdir)
+
+    def _scan_dir(self, rel_dir):
+        abs_dir = self._abs_dir(rel_dir)
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            self._drop_dir(rel_dir)
+            return
+
+        files = []
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive:
+                        subdirs.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in self.extensions and entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+
+        previous = self._dirs.get(rel_dir)
+        if previous is not None:
+            _old_mtime, old_files, old_subdirs = previous
+            for filename in set(old_files).difference(files):
+                self._mtimes.pop(os.path.join(rel_dir, filename) if rel_dir else filename, None)
+            for subdir in set(old_subdirs).difference(subdirs):
+                self._drop_dir(os.path.join(rel_dir, subdir) if rel_dir else subdir)
+        self._dirs[rel_dir] = (mtime_ns, files, subdirs)
+
+        for subdir in subdirs:
+            child = os.path.join(rel_dir, subdir) if rel_dir else subdir
+            if child not in self._dirs:
+                self._scan_dir(child)
+
+    def refresh(self):
+        if not self._dirs:
+            self._scan_dir("")
+            self._sorted.clear()
+            return
+
+        changed = False
+        for rel_dir in list(self._dirs):
+            entry = self._dirs.get(rel_dir)
+            if entry is None:
+                continue
+            try:
+                mtime_ns = os.stat(self._abs_dir(rel_dir)).st_mtime_ns
+            except OSError:
+                self._drop_dir(rel_dir)
+                changed = True
+                continue
+            if mtime_ns != entry[0]:
+                self._scan_dir(rel_dir)
+                changed = True
+
+        if changed:
+            self._sorted.clear()
+
+    def _get_mtime(self, rel_path):
+        mtime = self._mtimes.get(rel_path)
+        if mtime is None:
+            try:
+                mtime = os.path.getmtime(os.path.join(self.folder_path, rel_path))
+            except OSError:
+                mtime = 0.0
+            self._mtimes[rel_path] = mtime
+        return mtime
+
+    def get_files(self, sort_by):
+        with self._lock:
+            self.refresh()
+            files = self._sorted.get(sort_by)
+            if files is not None:
+                return files
+
+            files = []
+            for rel_dir, (_mtime_ns, filenames, _subdirs) in self._dirs.items():
+                if rel_dir:
+                    files.extend(os.path.join(rel_dir, filename) for filename in filenames)
+                else:
+                    files.extend(filenames)
+
+            if sort_by == "name_asc":
+                files.sort()
+            elif sort_by == "name_desc":
+                files.sort(reverse=True)
+            elif sort_by == "modified_asc":
+                files.sort(key=self._get_mtime)
+            elif sort_by == "modified_desc":
+                files.sort(key=self._get_mtime, reverse=True)
+
+            self._sorted[sort_by] = files
+            return files
+
+
+def get_folder_index(folder_path, recursive, extensions):
+    key = (os.path.abspath(folder_path), bool(recursive), frozenset(extensions))
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = FolderIndex(key[0], key[1], key[2])
+            _INDEXES[key] = index
+            while len(_INDEXES) > _MAX_INDEXES:
+                _INDEXES.popitem(last=False)
+        else:
+            _INDEXES.move_to_end(key)
+        return index
+
+
+def list_folder_files(folder_path, extensions, sort_by="name_asc", recursive=False):
+    if not os.path.isdir(folder_path):
+        return []
+    return get_folder_index(folder_path, recursive, extensions).get_files(sort_by)
+
+
+def invalidate_folder_index(folder_path=None):
+    with _INDEXES_LOCK:
+        if folder_path is None:
+            _INDEXES.clear()
+            return
+        target = os.path.abspath(folder_path)
+        for key in [key for key in _INDEXES if key[0] == target]:
+            del _INDEXES[key]
@@ -0,0 +1,175 @@
+import math
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+_BYTE_SCALE = np.float32(1.0 / 255.0)
+_REDUCE_MODES = {"L", "LA", "La", "RGB", "RGBA", "RGBa", "RGBX", "CMYK", "YCbCr", "LAB", "HSV", "I", "F"}
+
+
+def _bytes_to_float(array, out=None):
+    if out is None:
+        out = torch.empty(array.shape, dtype=torch.float32)
+    elif tuple(out.shape) != array.shape or out.dtype != torch.float32:
+        raise ValueError(f"out buffer must be float32 with shape {array.shape}, got {out.dtype} {tuple(out.shape)}")
+
+    np.multiply(array, _BYTE_SCALE, out=out.numpy(), dtype=np.float32)
+    return out
+
+
+def has_alpha(image):
+    return "A" in image.getbands() or (image.mode == "P" and "transparency" in image.info)
+
+
+def pil_to_tensor(image, out=None):
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return _bytes_to_float(np.asarray(image), out=out)
+
+
+def pil_to_image_and_mask(image, out=None):
+    if has_alpha(image):
+        rgba = np.asarray(image.convert("RGBA"))
+        image_tensor = _bytes_to_float(rgba[..., :3], out=out)
+        mask = _bytes_to_float(rgba[..., 3])
+        mask.neg_().add_(1.0)
+        return image_tensor, mask
+
+    width, height = image.size
+    return pil_to_tensor(image, out=out), torch.zeros((height, width), dtype=torch.float32)
+
+
+def open_image(path, max_side=0):
+    image = Image.open(path)
+    if max_side and image.format in ("JPEG", "MPO"):
+        width, height = image.size
+        scale = max_side / max(width, height)
+        if scale < 1:
+            image.draft(image.mode, (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))))
+    return image
+
+
+def limit_image_size(image, max_side=0):
+    if not max_side:
+        return image
+
+    longest = max(image.size)
+    if longest <= max_side:
+        return image
+
+    if image.mode not in _REDUCE_MODES:
+        # reduce() and resize() reject palette, bilevel and 16-bit modes such as I;16.
+        image = image.convert("RGBA" if has_alpha(image) else "RGB")
+
+    factor = longest // max_side
+    if factor >= 2:
+        image = image.reduce(factor)
+        longest = max(image.size)
+
+    if longest > max_side:
+        scale = max_side / longest
+        width, height = image.size
+        image = image.resize(
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            Image.Resampling.LANCZOS,
+        )
+    return image
+
+
+def tensor_to_uint8(tensor):
+    array = tensor.detach().cpu().mul(255.0).clamp_(0, 255).to(torch.uint8).numpy()
+    if array.shape[-1] == 1:
+        array = array[..., 0]
+    return array
+
+
+def tensor_to_pil_images(tensor):
+    if tensor.ndim == 3:
+        tensor = tensor.unsqueeze(0)
+    return [Image.fromarray(frame) for frame in tensor_to_uint8(tensor)]
+
+
+IMAGE_SAVE_FORMATS = {
+    "png": "PNG",
+    "jpg": "JPEG",
+    "jpeg": "JPEG",
+    "webp": "WEBP",
+    "tif": "TIFF",
+    "tiff": "TIFF",
+}
+JPEG_SUBSAMPLING_OPTIONS = ("4:2:0", "4:2:2", "4:4:4")
+DEFAULT_ENCODER_PROFILE = {
+    "png_compress_level": 6,
+    "jpeg_quality": 95,
+    "jpeg_subsampling": "4:2:0",
+    "jpeg_progressive": False,
+    "webp_quality": 95,
+    "webp_method": 4,
+    "webp_lossless": False,
+}
+
+
+def _clamp_int(value, default, low, high):
+    try:
+        return max(low, min(high, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_encoder_profile(profile=None):
+    profile = {**DEFAULT_ENCODER_PROFILE, **(profile or {})}
+    subsampling = profile["jpeg_subsampling"]
+    return {
+        "png_compress_level": _clamp_int(profile["png_compress_level"], 6, 0, 9),
+        "jpeg_quality": _clamp_int(profile["jpeg_quality"], 95, 1, 100),
+        "jpeg_subsampling": subsampling if subsampling in JPEG_SUBSAMPLING_OPTIONS else "4:2:0",
+        "jpeg_progressive": bool(profile["jpeg_progressive"]),
+        "webp_quality": _clamp_int(profile["webp_quality"], 95, 1, 100),
+        "webp_method": _clamp_int(profile["webp_method"], 4, 0, 6),
+        "webp_lossless": bool(profile["webp_lossless"]),
+    }
+
+
+def get_save_kwargs(file_ext, profile=None):
+    format_name = IMAGE_SAVE_FORMATS.get((file_ext or "png").lower().lstrip("."), "PNG")
+    profile = normalize_encoder_profile(profile)
+
+    if format_name == "PNG":
+        return format_name, {"compress_level": profile["png_compress_level"]}
+    if format_name == "JPEG":
+        return format_name, {
+            "quality": profile["jpeg_quality"],
+            "subsampling": profile["jpeg_subsampling"],
+            "progressive": profile["jpeg_progressive"],
+        }
+    if format_name == "WEBP":
+        return format_name, {
+            "quality": profile["webp_quality"],
+            "method": profile["webp_method"],
+            "lossless": profile["webp_lossless"],
+        }
+    return format_name, {}
+
+
+def save_pil_image(image, target, file_ext, profile=None):
+    format_name, save_kwargs = get_save_kwargs(file_ext, profile)
+    if format_name == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(target, format=format_name, **save_kwargs)
+
+
+def save_pil_frames(frames, target, file_ext, profile=None, duration=100):
+    if len(frames) == 1:
+        save_pil_image(frames[0], target, file_ext, profile)
+        return
+
+    format_name, save_kwargs = get_save_kwargs(file_ext, profile)
+    if format_name not in ("PNG", "WEBP", "TIFF"):
+        raise ValueError(f"{format_name} cannot store multiple frames. Use png (APNG), webp or tiff.")
+
+    save_kwargs.update(save_all=True, append_images=frames[1:])
+    if format_name != "TIFF":
+        save_kwargs.update(duration=duration, loop=0)
+    frames[0].save(target, format=format_name, **save_kwargs)
@@ -1,18 +1,30 @@
+import io
+import itertools
 import os
+import zlib
 
-import numpy as np
 import torch
-from PIL import Image, ImageOps, ImageSequence
+from PIL import ImageOps, ImageSequence
 
+from .archive_source import invalidate_archive_source, is_archive_source, list_archive_files, read_archive_member
+from .atomic_io import is_intact_output
 from .auto_queue_control import stop_current_iteration
+from .checkpoint_store import PersistentCounters
+from .completion_index import get_completion_index, mark_output_complete
+from .folder_index import invalidate_folder_index, list_folder_files
+from .image_io import limit_image_size, open_image, pil_to_image_and_mask
+from .image_prefetch import get_prefetcher
+from .manifest_source import get_manifest_column, get_manifest_root
 from .save_resolver import build_output_path, is_processing_complete, normalize_save_spec
+from .work_lease import is_leased, release_lease, try_claim_lease
+from .write_behind import is_write_pending
 
 
 SUPPORTED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tiff", ".tif", ".gif"}
 
 
 class ImageIterator:
-    _counters = {}
+    _counters = PersistentCounters("image_iterator")
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -22,7 +34,8 @@ class ImageIterator:
                     "default": "",
                     "multiline": False,
                     "placeholder": "Absolute path to the image folder",
-                    "tooltip": "Folder that contains the images to iterate.",
+                    "tooltip": "Folder that contains the images to iterate. A .tar/.zip archive or a glob of "
+                               "archive shards (e.g. /data/shard-*.tar) is streamed without extracting.",
                 }),
                 "sort_by": (["name_asc", "name_desc", "modified_asc", "modified_desc"], {
                     "default": "name_asc",
@@ -51,12 +64,67 @@ class ImageIterator:
                     "default": False,
                     "label_on": "Reset",
                     "label_off": "Continue",
-                    "tooltip": "Reset the iterator back to the start index.",
+                    "tooltip": "Reset the iterator back to the start index and rescan the input and output folders.",
                 }),
                 "save_spec": ("ITERATOR_SAVE_SPEC", {
                     "forceInput": True,
                     "tooltip": "Optional shared save rules. Completed outputs are skipped automatically.",
                 }),
+                "batch_size": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 256,
+                    "step": 1,
+                    "tooltip": "Number of pending images loaded per run. Batches use the first frame of each file and "
+                               "output filename/subfolder as lists. A batch ends early at the first image whose size "
+                               "differs, so every batch holds a single resolution.",
+                }),
+                "prefetch_depth": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 64,
+                    "step": 1,
+                    "tooltip": "Decode this many upcoming pending images in the background while the workflow runs. "
+                               "0 disables prefetching.",
+                }),
+                "max_side": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 16384,
+                    "step": 8,
+                    "tooltip": "Downscale while decoding so the longest side is at most this many pixels. "
+                               "JPEGs are decoded directly at reduced size. 0 keeps the full resolution.",
+                }),
+                "shard_index": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 1023,
+                    "step": 1,
+                    "tooltip": "Which shard this worker processes when several ComfyUI instances share one folder.",
+                }),
+                "shard_count": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 1024,
+                    "step": 1,
+                    "tooltip": "Total number of workers splitting the folder. Files are assigned by a hash of their "
+                               "relative path. 1 disables sharding.",
+                }),
+                "manifest_path": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "placeholder": "Optional CSV/JSONL/Parquet file list",
+                    "tooltip": "Iterate the files listed in the 'path' column of this manifest, in manifest order, "
+                               "instead of scanning the folder. Paths are relative to folder_path, or to the "
+                               "manifest's folder when folder_path is empty. Parquet requires pyarrow.",
+                }),
+                "resume_strategy": (["linear", "prefix_binary_search"], {
+                    "default": "linear",
+                    "tooltip": "prefix_binary_search assumes finished outputs form a contiguous prefix of the sorted "
+                               "list. On a cold start in sequential mode with save_spec it binary-searches for the "
+                               "first missing output, then checks the following files one by one instead of indexing "
+                               "the whole output folder. Not used with sharding.",
+                }),
             },
         }
 
@@ -68,54 +136,86 @@ class ImageIterator:
     DESCRIPTION = "Iterate through a folder of images. Optionally skips files that already have finished outputs."
 
     @classmethod
-    def _get_counter_key(cls, folder_path, sort_by, recursive=False):
-        return f"{folder_path}|{sort_by}|{recursive}"
+    def _get_counter_key(cls, folder_path, sort_by, recursive=False, shard_index=0, shard_count=1, manifest_path=""):
+        key = f"{folder_path}|{sort_by}|{recursive}"
+        if manifest_path:
+            key = f"{key}|manifest:{manifest_path}"
+        if shard_count > 1:
+            key = f"{key}|shard{shard_index}/{shard_count}"
+        return key
+
+    @staticmethod
+    def _resolve_source(folder_path, manifest_path=""):
+        manifest_path = (manifest_path or "").strip()
+        if manifest_path:
+            folder_path = get_manifest_root(manifest_path, folder_path)
+        return folder_path, manifest_path
 
     @classmethod
-    def _get_image_list(cls, folder_path, sort_by, recursive=False):
-        if not os.path.isdir(folder_path):
-            return []
-
-        files = []
-        if recursive:
-            for root, _dirs, filenames in os.walk(folder_path):
-                for filename in filenames:
-                    ext = os.path.splitext(filename)[1].lower()
-                    if ext in SUPPORTED_EXTENSIONS:
-                        rel_path = os.path.relpath(os.path.join(root, filename), folder_path)
-                        files.append(rel_path)
-        else:
-            for filename in os.listdir(folder_path):
-                full_path = os.path.join(folder_path, filename)
-                ext = os.path.splitext(filename)[1].lower()
-                if ext in SUPPORTED_EXTENSIONS and os.path.isfile(full_path):
-                    files.append(filename)
-
-        if sort_by == "name_asc":
-            files.sort()
-        elif sort_by == "name_desc":
-            files.sort(reverse=True)
-        elif sort_by == "modified_asc":
-            files.sort(key=lambda rel_path: os.path.getmtime(os.path.join(folder_path, rel_path)))
-        elif sort_by == "modified_desc":
-            files.sort(key=lambda rel_path: os.path.getmtime(os.path.join(folder_path, rel_path)), reverse=True)
-
-        return files
+    def _get_image_list(cls, folder_path, sort_by, recursive=False, manifest_path=""):
+        if manifest_path:
+            return get_manifest_column(manifest_path, "path")
+        if is_archive_source(folder_path):
+            return list_archive_files(folder_path, SUPPORTED_EXTENSIONS, sort_by=sort_by)
+        return list_folder_files(folder_path, SUPPORTED_EXTENSIONS, sort_by=sort_by, recursive=recursive)
+
+    @staticmethod
+    def _in_shard(image_rel_path, shard_index, shard_count):
+        if shard_count <= 1:
+            return True
+        shard_key = image_rel_path.replace(os.sep, "/").encode("utf-8")
+        return zlib.crc32(shard_key) % shard_count == shard_index
 
     @staticmethod
-    def _resolve_pending_index(image_files, start_index, mode, save_spec):
+    def _is_output_done(output_path, save_spec, probe=False):
+        if not probe:
+            return is_processing_complete(output_path, save_spec)
+        if is_write_pending(output_path):
+            return True
+        if not os.path.exists(output_path):
+            return False
+        return not save_spec["verify_existing"] or is_intact_output(output_path)
+
+    @classmethod
+    def _claim_output(cls, output_path, save_spec, claim=True, probe=False):
+        if cls._is_output_done(output_path, save_spec, probe):
+            return False
+
+        lease_ttl = save_spec.get("lease_ttl", 0)
+        if lease_ttl <= 0:
+            return True
+        if not claim:
+            return not is_leased(output_path)
+        if not try_claim_lease(output_path, lease_ttl):
+            return False
+        if save_spec["output_mode"] == "tar_shards":
+            # Shard samples never exist as files; re-read the shard key index instead.
+            get_completion_index(save_spec, refresh=True)
+            finished = is_processing_complete(output_path, save_spec)
+        else:
+            finished = os.path.exists(output_path)
+        if finished:
+            # Another worker finished it after our completion index was built.
+            mark_output_complete(save_spec, output_path)
+            release_lease(output_path)
+            return False
+        return True
+
+    @classmethod
+    def _resolve_pending_index(cls, image_files, start_index, mode, save_spec, shard_index=0, shard_count=1,
+                               claim=True, probe=False):
         total_count = len(image_files)
         if total_count == 0:
             return None
 
-        if save_spec is None:
+        if save_spec is None and shard_count <= 1:
             if mode == "loop":
                 return start_index % total_count
             return start_index if 0 <= start_index < total_count else None
 
         if mode == "loop":
             base_index = start_index % total_count
-            candidate_indices = list(range(base_index, total_count)) + list(range(0, base_index))
+            candidate_indices = itertools.chain(range(base_index, total_count), range(0, base_index))
         else:
             if start_index >= total_count:
                 return None
@@ -123,34 +223,138 @@ class ImageIterator:
 
         for index in candidate_indices:
             image_rel_path = image_files[index]
-            subfolder = os.path.dirname(image_rel_path)
-            image_filename = os.path.basename(image_rel_path)
-            filename_no_ext = os.path.splitext(image_filename)[0]
-            output_path = build_output_path(save_spec, filename_no_ext, subfolder=subfolder)
-            if not is_processing_complete(output_path, save_spec):
+            if not cls._in_shard(image_rel_path, shard_index, shard_count):
+                continue
+            if save_spec is None:
+                return index
+
+            if cls._claim_output(cls._output_path_for(image_rel_path, save_spec), save_spec, claim, probe):
                 return index
 
         return None
 
+    @staticmethod
+    def _output_path_for(image_rel_path, save_spec):
+        subfolder = os.path.dirname(image_rel_path)
+        filename_no_ext = os.path.splitext(os.path.basename(image_rel_path))[0]
+        return build_output_path(save_spec, filename_no_ext, subfolder=subfolder)
+
+    @classmethod
+    def _find_resume_index(cls, image_files, start_index, save_spec):
+        low = start_index
+        high = len(image_files)
+        while low < high:
+            middle = (low + high) // 2
+            output_path = cls._output_path_for(image_files[middle], save_spec)
+            if cls._is_output_done(output_path, save_spec, probe=save_spec["output_mode"] != "tar_shards"):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @classmethod
+    def _resolve_pending_indices(cls, image_files, start_index, mode, save_spec, count, shard_index=0, shard_count=1,
+                                 claim=True, probe=False):
+        indices = []
+        cursor = start_index
+        while len(indices) < count:
+            index = cls._resolve_pending_index(
+                image_files, cursor, mode, save_spec, shard_index, shard_count, claim, probe
+            )
+            if index is None or index in indices:
+                break
+            indices.append(index)
+            cursor = index + 1
+        return indices
+
+    @staticmethod
+    def _load_image_tensors(image_path, max_side=0):
+        img = open_image(image_path, max_side)
+        img = ImageOps.exif_transpose(img)
+
+        output_images = []
+        output_masks = []
+
+        for frame in ImageSequence.Iterator(img):
+            frame = ImageOps.exif_transpose(frame)
+
+            if frame.mode == "I":
+                frame = frame.point(lambda value: value * (1 / 255))
+            frame = limit_image_size(frame, max_side)
+            image_tensor, mask = pil_to_image_and_mask(frame)
+
+            output_images.append(image_tensor.unsqueeze(0))
+            output_masks.append(mask.unsqueeze(0))
+
+            if img.format == "MPO":
+                break
+
+        if len(output_images) > 1:
+            return torch.cat(output_images, dim=0), torch.cat(output_masks, dim=0)
+        return output_images[0], output_masks[0]
+
+    @classmethod
+    def _load_source_tensors(cls, folder_path, image_rel_path, max_side=0):
+        if is_archive_source(folder_path):
+            image_bytes = read_archive_member(folder_path, image_rel_path)
+            return cls._load_image_tensors(io.BytesIO(image_bytes), max_side)
+        return cls._load_image_tensors(os.path.join(folder_path, image_rel_path), max_side)
+
     def load_next_image(self, folder_path, sort_by="name_asc", mode="sequential",
-                        recursive=False, start_index=0, reset=False, save_spec=None):
-        if not folder_path or not os.path.isdir(folder_path):
+                        recursive=False, start_index=0, reset=False, save_spec=None, batch_size=1,
+                        prefetch_depth=0, max_side=0, shard_index=0, shard_count=1, manifest_path="",
+                        resume_strategy="linear"):
+        folder_path, manifest_path = self._resolve_source(folder_path, manifest_path)
+        if manifest_path and not os.path.isfile(manifest_path):
+            raise ValueError(f"Manifest file not found: {manifest_path}")
+
+        archive_source = is_archive_source(folder_path)
+        if not folder_path or not (archive_source or os.path.isdir(folder_path)):
             raise ValueError(f"Invalid folder path: {folder_path}")
 
-        image_files = self._get_image_list(folder_path, sort_by, recursive)
+        if reset:
+            if archive_source:
+                invalidate_archive_source(folder_path)
+            else:
+                invalidate_folder_index(folder_path)
+
+        image_files = self._get_image_list(folder_path, sort_by, recursive, manifest_path)
         total_count = len(image_files)
         if total_count == 0:
-            raise ValueError(f"No supported image files found in folder: {folder_path}")
-
-        counter_key = self._get_counter_key(folder_path, sort_by, recursive)
-        if reset or counter_key not in ImageIterator._counters:
+            raise ValueError(f"No supported image files found in {manifest_path or folder_path}")
+
+        shard_count = max(1, int(shard_count or 1))
+        shard_index = int(shard_index or 0)
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"shard_index must be between 0 and {shard_count - 1}, got {shard_index}.")
+
+        counter_key = self._get_counter_key(folder_path, sort_by, recursive, shard_index, shard_count, manifest_path)
+        prefetcher = get_prefetcher(counter_key)
+        if reset:
+            prefetcher.clear()
+        cold_start = reset or counter_key not in ImageIterator._counters
+        if cold_start:
             current_index = start_index
         else:
             current_index = ImageIterator._counters[counter_key]
 
         spec = normalize_save_spec(save_spec) if save_spec is not None else None
-        next_index = self._resolve_pending_index(image_files, current_index, mode, spec)
-        if next_index is None:
+        prefix_resume = (resume_strategy == "prefix_binary_search" and spec is not None
+                         and mode == "sequential" and shard_count <= 1)
+        # With prefix resume, file outputs are probed one by one so the output folder is never walked.
+        probe_outputs = prefix_resume and spec["output_mode"] != "tar_shards"
+        if spec is not None and reset and not probe_outputs:
+            get_completion_index(spec, refresh=True)
+        if prefix_resume and cold_start:
+            resume_index = self._find_resume_index(image_files, current_index, spec)
+            if resume_index > current_index:
+                print(f"[ImageIterator] Outputs exist up to index {resume_index - 1}, resuming at {resume_index}.")
+            current_index = resume_index
+        batch_size = max(1, int(batch_size or 1))
+        batch_indices = self._resolve_pending_indices(
+            image_files, current_index, mode, spec, batch_size, shard_index, shard_count, probe=probe_outputs
+        )
+        if not batch_indices:
             ImageIterator._counters[counter_key] = total_count
             stop_current_iteration(
                 "ImageIterator",
@@ -161,71 +365,90 @@ class ImageIterator:
                 skipped_completed=spec is not None,
             )
 
-        current_index = next_index
-        image_rel_path = image_files[current_index]
-        image_path = os.path.join(folder_path, image_rel_path)
-
-        subfolder = os.path.dirname(image_rel_path)
-        image_filename = os.path.basename(image_rel_path)
-        filename_no_ext = os.path.splitext(image_filename)[0]
-
-        img = Image.open(image_path)
-        img = ImageOps.exif_transpose(img)
-
         output_images = []
         output_masks = []
+        filenames = []
+        filenames_with_ext = []
+        subfolders = []
+        deferred_keys = []
 
-        for frame in ImageSequence.Iterator(img):
-            frame = ImageOps.exif_transpose(frame)
-
-            if frame.mode == "I":
-                frame = frame.point(lambda value: value * (1 / 255))
-            image = frame.convert("RGB")
-
-            image_np = np.array(image).astype(np.float32) / 255.0
-            image_tensor = torch.from_numpy(image_np)[None,]
-
-            if "A" in frame.getbands():
-                mask = np.array(frame.getchannel("A")).astype(np.float32) / 255.0
-                mask = 1.0 - torch.from_numpy(mask)
-            elif frame.mode == "P" and "transparency" in frame.info:
-                mask = np.array(frame.convert("RGBA").getchannel("A")).astype(np.float32) / 255.0
-                mask = 1.0 - torch.from_numpy(mask)
-            else:
-                width, height = frame.size
-                mask = torch.zeros((height, width), dtype=torch.float32, device="cpu")
-
-            output_images.append(image_tensor)
-            output_masks.append(mask.unsqueeze(0))
-
-            if img.format == "MPO":
+        for position, index in enumerate(batch_indices):
+            image_rel_path = image_files[index]
+            image_filename = os.path.basename(image_rel_path)
+            image_path = os.path.join(folder_path, image_rel_path)
+            prefetched = prefetcher.take((image_path, max_side))
+            if prefetched is None:
+                prefetched = self._load_source_tensors(folder_path, image_rel_path, max_side)
+            image_tensor, mask_tensor = prefetched
+
+            if output_images and image_tensor.shape[1:3] != output_images[0].shape[1:3]:
+                # Different resolution: end the batch here and hand this image to the next run.
+                prefetcher.put((image_path, max_side), prefetched)
+                deferred_keys.append((image_path, max_side))
+                if spec is not None:
+                    for deferred_index in batch_indices[position:]:
+                        release_lease(self._output_path_for(image_files[deferred_index], spec))
+                batch_indices = batch_indices[:position]
                 break
 
-        if len(output_images) > 1:
-            output_image = torch.cat(output_images, dim=0)
-            output_mask = torch.cat(output_masks, dim=0)
-        else:
-            output_image = output_images[0]
-            output_mask = output_masks[0]
+            output_images.append(image_tensor)
+            output_masks.append(mask_tensor)
+            filenames.append(os.path.splitext(image_filename)[0])
+            filenames_with_ext.append(image_filename)
+            subfolders.append(os.path.dirname(image_rel_path))
 
+        current_index = batch_indices[0]
+        last_index = batch_indices[-1]
         if mode == "loop":
-            ImageIterator._counters[counter_key] = (current_index + 1) % total_count
+            ImageIterator._counters[counter_key] = (last_index + 1) % total_count
         else:
-            ImageIterator._counters[counter_key] = current_index + 1
+            ImageIterator._counters[counter_key] = last_index + 1
+
+        upcoming_rel_paths = []
+        if prefetch_depth > 0:
+            # Look ahead without claiming leases; only the batch handed out above holds them.
+            upcoming_indices = self._resolve_pending_indices(
+                image_files, ImageIterator._counters[counter_key], mode, spec, prefetch_depth, shard_index, shard_count,
+                claim=False, probe=probe_outputs,
+            )
+            upcoming_rel_paths = [image_files[index] for index in upcoming_indices]
+        prefetcher.retain(
+            deferred_keys + [(os.path.join(folder_path, rel_path), max_side) for rel_path in upcoming_rel_paths]
+        )
+        for rel_path in upcoming_rel_paths:
+            prefetcher.schedule(
+                (os.path.join(folder_path, rel_path), max_side),
+                self._load_source_tensors, folder_path, rel_path, max_side,
+            )
+
+        if batch_size == 1:
+            return (
+                output_images[0],
+                output_masks[0],
+                filenames[0],
+                filenames_with_ext[0],
+                subfolders[0],
+                current_index,
+                total_count,
+            )
 
+        output_image = torch.cat([image[:1] for image in output_images], dim=0)
+        output_mask = torch.cat([mask[:1] for mask in output_masks], dim=0)
         return (
             output_image,
             output_mask,
-            filename_no_ext,
-            image_filename,
-            subfolder,
+            filenames,
+            filenames_with_ext,
+            subfolders,
             current_index,
             total_count,
         )
 
     @classmethod
     def IS_CHANGED(cls, folder_path, sort_by="name_asc", mode="sequential",
-                   recursive=False, start_index=0, reset=False, save_spec=None):
-        counter_key = cls._get_counter_key(folder_path, sort_by, recursive)
+                   recursive=False, start_index=0, reset=False, save_spec=None, shard_index=0, shard_count=1,
+                   manifest_path="", **kwargs):
+        folder_path, manifest_path = cls._resolve_source(folder_path, manifest_path)
+        counter_key = cls._get_counter_key(folder_path, sort_by, recursive, shard_index, shard_count, manifest_path)
         current = cls._counters.get(counter_key, start_index)
         return f"{current}_{reset}_{bool(save_spec)}"
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+PREFETCH_MAX_WORKERS = 4
+# One byte budget shared by every prefetcher; idle prefetchers are evicted oldest first.
+PREFETCH_MAX_BYTES = 2 * 1024 ** 3
+PREFETCH_MAX_PREFETCHERS = 8
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+_PREFETCHERS = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _get_executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=PREFETCH_MAX_WORKERS,
+                thread_name_prefix="image_anything_prefetch",
+            )
+        return _EXECUTOR
+
+
+def _result_nbytes(result):
+    return sum(tensor.element_size() * tensor.nelement() for tensor in result)
+
+
+class ImagePrefetcher:
+    def __init__(self):
+        self._futures = OrderedDict()
+        self._largest_result = 0
+
+    def _committed_bytes(self):
+        held = 0
+        pending = 0
+        for future in self._futures.values():
+            if not future.done():
+                pending += 1
+            elif not future.cancelled() and future.exception() is None:
+                nbytes = _result_nbytes(future.result())
+                self._largest_result = max(self._largest_result, nbytes)
+                held += nbytes
+        # Decodes still running reserve the size of the largest result seen so far.
+        return held + pending * self._largest_result, pending
+
+    def _drop_all(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+
+    def retain(self, keys):
+        wanted = set(keys)
+        with _LOCK:
+            for key in [key for key in self._futures if key not in wanted]:
+                self._futures.pop(key).cancel()
+
+    def schedule(self, key, loader, *args):
+        with _LOCK:
+            if key in self._futures:
+                return False
+            committed, pending = self._committed_bytes()
+            if pending and not self._largest_result:
+                # No decode has finished yet, so there is nothing to size a reservation from.
+                return False
+
+            others = [prefetcher for prefetcher in _PREFETCHERS.values() if prefetcher is not self]
+            total = committed + sum(prefetcher._committed_bytes()[0] for prefetcher in others)
+            for prefetcher in others:
+                if total + self._largest_result <= PREFETCH_MAX_BYTES:
+                    break
+                total -= prefetcher._committed_bytes()[0]
+                prefetcher._drop_all()
+            if total + self._largest_result > PREFETCH_MAX_BYTES:
+                return False
+            self._futures[key] = _get_executor().submit(loader, *args)
+            return True
+
+    def put(self, key, result):
+        future = Future()
+        future.set_result(result)
+        with _LOCK:
+            self._futures[key] = future
+
+    def take(self, key):
+        with _LOCK:
+            future = self._futures.pop(key, None)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def clear(self):
+        self.retain(())
+
+
+def get_prefetcher(key):
+    with _LOCK:
+        prefetcher = _PREFETCHERS.pop(key, None)
+        if prefetcher is None:
+            prefetcher = ImagePrefetcher()
+        _PREFETCHERS[key] = prefetcher
+        while len(_PREFETCHERS) > PREFETCH_MAX_PREFETCHERS:
+            _stale_key, stale = _PREFETCHERS.popitem(last=False)
+            stale._drop_all()
+        return prefetcher
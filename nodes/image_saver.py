@@ -1,16 +1,81 @@
+import io
 import os
-
-import numpy as np
-from PIL import Image
+import re
+import threading
 
 import folder_paths
+from .atomic_io import atomic_write, is_intact_output
+from .completion_index import discard_output, mark_output_complete
+from .image_io import save_pil_frames, save_pil_image, tensor_to_pil_images
 from .save_resolver import (
     build_output_path,
     ensure_parent_dir,
+    is_processing_complete,
     normalize_extension,
     normalize_save_spec,
     resolve_existing_output,
 )
+from .shard_writer import write_shard_sample
+from .work_lease import release_lease
+from .write_behind import submit_write
+
+
+_COUNTER_PATTERN = re.compile(r"^(.*)_(\d{3,})\.png$")
+_NEXT_COUNTERS = {}
+_NEXT_COUNTERS_LOCK = threading.Lock()
+
+
+def _try_create(path):
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def _discard_placeholder(path):
+    try:
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _scan_counters(output_dir):
+    counters = {}
+    for name in os.listdir(output_dir):
+        match = _COUNTER_PATTERN.match(name)
+        if match:
+            base, number = match.group(1), int(match.group(2))
+            counters[base] = max(counters.get(base, 1), number + 1)
+    return counters
+
+
+def _reserve_unique_path(output_dir, base):
+    filepath = os.path.join(output_dir, f"{base}.png")
+    if _try_create(filepath):
+        return filepath
+
+    while True:
+        with _NEXT_COUNTERS_LOCK:
+            counters = _NEXT_COUNTERS.get(output_dir)
+            if counters is None:
+                counters = _scan_counters(output_dir)
+                _NEXT_COUNTERS[output_dir] = counters
+            counter = counters.get(base, 1)
+            counters[base] = counter + 1
+
+        filepath = os.path.join(output_dir, f"{base}_{counter:03d}.png")
+        if _try_create(filepath):
+            return filepath
+
+
+def _frame_path(filepath, position):
+    if position == 0:
+        return filepath
+    root, extension = os.path.splitext(filepath)
+    return f"{root}_f{position:03d}{extension}"
 
 
 class ImageSaver:
@@ -57,6 +122,33 @@ class ImageSaver:
                         "tooltip": "Optional shared save rules from Processed Image Check.",
                     },
                 ),
+                "write_mode": (
+                    ["sync", "background"],
+                    {
+                        "default": "sync",
+                        "tooltip": "Background encodes and writes files on a worker pool so the next run can start. "
+                                   "Write errors are reported on a later save.",
+                    },
+                ),
+                "batch_mode": (
+                    ["numbered_files", "animated", "first_frame"],
+                    {
+                        "default": "numbered_files",
+                        "tooltip": "How a multi-frame image with a single filename is saved. numbered_files writes "
+                                   "name, name_f001, name_f002, ...; animated writes one APNG/WEBP/multi-page TIFF "
+                                   "(the format follows save_spec, PNG otherwise); first_frame keeps only frame 0.",
+                    },
+                ),
+                "frame_duration_ms": (
+                    "INT",
+                    {
+                        "default": 100,
+                        "min": 1,
+                        "max": 60000,
+                        "step": 1,
+                        "tooltip": "Display time of each frame in animated output.",
+                    },
+                ),
             },
         }
 
@@ -65,27 +157,57 @@ class ImageSaver:
     FUNCTION = "save_image"
     OUTPUT_NODE = True
     CATEGORY = "\U0001F6A6 ComfyUI_Image_Anything/Iterator"
-    DESCRIPTION = "Save an image to disk. Supports optional filename and subfolder inputs."
+    DESCRIPTION = ("Save an image to disk. Supports optional filename and subfolder inputs, including batched lists. "
+                   "Multi-frame batches are saved as numbered files or as one animated APNG, WEBP or TIFF.")
+
+    def save_image(self, image, save_path="", filename="", subfolder="", save_spec=None, write_mode="sync",
+                   batch_mode="numbered_files", frame_duration_ms=100):
+        if image.ndim == 3:
+            image = image.unsqueeze(0)
 
-    def save_image(self, image, save_path="", filename="", subfolder="", save_spec=None):
-        i_array = image.cpu().numpy()
-        if i_array.ndim == 4:
-            i_array = i_array[0]
+        if isinstance(filename, (list, tuple)):
+            if len(filename) != image.shape[0]:
+                raise ValueError(
+                    f"ImageSaver received {len(filename)} filenames for a batch of {image.shape[0]} images."
+                )
+            subfolders = subfolder if isinstance(subfolder, (list, tuple)) else [subfolder] * len(filename)
+            frames = tensor_to_pil_images(image)
+            saved_paths = []
+            for position, name in enumerate(filename):
+                saved_paths.append(
+                    self._save_single(frames[position], save_path, name, subfolders[position], save_spec, write_mode)
+                )
+            return ("\n".join(saved_paths),)
 
-        i_array = (np.clip(i_array, 0, 1) * 255).astype(np.uint8)
-        img = Image.fromarray(i_array)
+        if batch_mode == "first_frame":
+            image = image[:1]
+        frames = tensor_to_pil_images(image)
+        if len(frames) == 1:
+            return (self._save_single(frames[0], save_path, filename, subfolder, save_spec, write_mode),)
+
+        if batch_mode == "animated":
+            return (
+                self._save_single(frames, save_path, filename, subfolder, save_spec, write_mode, frame_duration_ms),
+            )
 
         clean_filename = filename.strip() if isinstance(filename, str) else ""
+        if save_spec is None and not clean_filename:
+            saved_paths = [self._save_single(frame, save_path, "", subfolder, None, write_mode) for frame in frames]
+            return ("\n".join(saved_paths),)
+        return (self._save_single(frames, save_path, filename, subfolder, save_spec, write_mode, numbered=True),)
+
+    def _save_single(self, img, save_path="", filename="", subfolder="", save_spec=None, write_mode="sync",
+                     frame_duration_ms=100, numbered=False):
+        clean_filename = filename.strip() if isinstance(filename, str) else ""
         if save_spec is not None:
             spec = normalize_save_spec(save_spec)
             filepath = build_output_path(spec, clean_filename, subfolder=subfolder)
-            action = resolve_existing_output(filepath, spec["exists_policy"])
-            if action == "skip":
-                return (filepath,)
-
-            ensure_parent_dir(filepath)
-            self._save_with_extension(img, filepath, spec["file_ext"])
-            return (filepath,)
+            if not numbered:
+                return self._save_spec_output(img, filepath, spec, write_mode, frame_duration_ms)
+            return "\n".join(
+                self._save_spec_output(frame, _frame_path(filepath, position), spec, write_mode)
+                for position, frame in enumerate(img)
+            )
 
         if save_path and save_path.strip():
             output_dir = save_path.strip()
@@ -104,41 +226,110 @@ class ImageSaver:
         os.makedirs(output_dir, exist_ok=True)
 
         if clean_filename:
-            full_filename = f"{clean_filename}.png"
-            filepath = os.path.join(output_dir, full_filename)
-
-            if os.path.exists(filepath):
-                base = clean_filename
-                counter = 1
-                while os.path.exists(filepath):
-                    full_filename = f"{base}_{counter:03d}.png"
-                    filepath = os.path.join(output_dir, full_filename)
-                    counter += 1
+            filepath = _reserve_unique_path(output_dir, clean_filename)
         else:
+            width, height = (img[0] if isinstance(img, list) else img).size
             full_output_folder, base_filename, counter, _, _ = folder_paths.get_save_image_path(
-                "ComfyUI", output_dir, i_array.shape[1], i_array.shape[0]
+                "ComfyUI", output_dir, width, height
             )
             full_filename = f"{base_filename}_{counter:05}_.png"
             filepath = os.path.join(full_output_folder, full_filename)
 
-        img.save(filepath, format="PNG")
-        return (filepath,)
+        if not numbered:
+            self._write_image(img, filepath, "png", write_mode, reserve=True, frame_duration_ms=frame_duration_ms)
+            return filepath
+
+        # Frames share the one reserved base name, so repeat saves never mix with collision counters.
+        frame_paths = [_frame_path(filepath, position) for position in range(len(img))]
+        for frame, frame_path in zip(img, frame_paths):
+            self._write_image(frame, frame_path, "png", write_mode, reserve=True)
+        return "\n".join(frame_paths)
 
-    def _save_with_extension(self, image, filepath, file_ext):
-        extension = normalize_extension(file_ext).lstrip(".")
-        format_name = {
-            "png": "PNG",
-            "jpg": "JPEG",
-            "jpeg": "JPEG",
-            "webp": "WEBP",
-        }.get(extension, "PNG")
+    def _save_spec_output(self, img, filepath, spec, write_mode, frame_duration_ms=100):
+        if spec["output_mode"] == "tar_shards":
+            return self._save_to_shard(img, filepath, spec, frame_duration_ms)
 
-        image_to_save = image
-        save_kwargs = {}
+        action = resolve_existing_output(filepath, spec["exists_policy"])
+        if action == "skip" and spec["verify_existing"] and not is_intact_output(filepath):
+            print(f"[ImageSaver] Rewriting damaged output {filepath}")
+            action = "overwrite"
+        if action == "skip":
+            mark_output_complete(spec, filepath)
+            release_lease(filepath)
+            return filepath
 
-        if format_name == "JPEG":
-            if image_to_save.mode not in ("RGB", "L"):
-                image_to_save = image_to_save.convert("RGB")
-            save_kwargs["quality"] = 95
+        ensure_parent_dir(filepath)
+        self._write_image(img, filepath, spec["file_ext"], write_mode, spec=spec,
+                          frame_duration_ms=frame_duration_ms)
+        return filepath
 
-        image_to_save.save(filepath, format=format_name, **save_kwargs)
+    def _save_to_shard(self, image, filepath, spec, frame_duration_ms=100):
+        try:
+            action = resolve_existing_output(
+                filepath, spec["exists_policy"], exists=is_processing_complete(filepath, spec)
+            )
+            if action == "skip":
+                return filepath
+
+            buffer = io.BytesIO()
+            self._save_with_extension(image, buffer, spec["file_ext"], spec["encoder"], frame_duration_ms)
+            extension = normalize_extension(spec["file_ext"]).lstrip(".")
+            saved_path = write_shard_sample(spec, filepath, {extension: buffer.getvalue()})
+            mark_output_complete(spec, filepath)
+            return saved_path
+        finally:
+            release_lease(filepath)
+
+    def _write_image(self, image, filepath, file_ext, write_mode, spec=None, reserve=False, frame_duration_ms=100):
+        profile = spec["encoder"] if spec is not None else None
+        fsync = spec["fsync"] if spec is not None else False
+        if write_mode != "background":
+            try:
+                atomic_write(
+                    filepath,
+                    lambda temp_path: self._save_with_extension(image, temp_path, file_ext, profile, frame_duration_ms),
+                    fsync=fsync,
+                )
+                if spec is not None:
+                    mark_output_complete(spec, filepath)
+            except Exception:
+                if reserve:
+                    _discard_placeholder(filepath)
+                raise
+            finally:
+                release_lease(filepath)
+            return
+
+        def on_error():
+            if spec is not None:
+                discard_output(spec, filepath)
+                release_lease(filepath)
+            if reserve:
+                _discard_placeholder(filepath)
+
+        on_success = lambda: release_lease(filepath)
+        if spec is not None:
+            mark_output_complete(spec, filepath, persist=False)
+
+            def on_success():
+                mark_output_complete(spec, filepath)
+                release_lease(filepath)
+
+        try:
+            submit_write(
+                filepath,
+                lambda temp_path: self._save_with_extension(image, temp_path, file_ext, profile, frame_duration_ms),
+                on_error=on_error,
+                on_success=on_success,
+                reserve=reserve,
+                fsync=fsync,
+            )
+        except Exception:
+            on_error()
+            raise
+
+    def _save_with_extension(self, image, filepath, file_ext, profile=None, frame_duration_ms=100):
+        if isinstance(image, list):
+            save_pil_frames(image, filepath, file_ext, profile, duration=frame_duration_ms)
+        else:
+            save_pil_image(image, filepath, file_ext, profile)
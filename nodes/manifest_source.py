@@ -0,0 +1,183 @@
+import bisect
+import csv
+import io
+import itertools
+import json
+import mmap
+import os
+import threading
+from array import array
+from collections.abc import Sequence
+
+from .atomic_io import atomic_write
+
+
+MANIFEST_EXTENSIONS = (".csv", ".jsonl", ".parquet")
+MANIFEST_COLUMNS = ("path", "caption", "control")
+ROW_INDEX_SUFFIX = ".rowidx"
+ROW_INDEX_VERSION = 0x5249445800000002
+
+_MANIFESTS = {}
+_MANIFESTS_LOCK = threading.Lock()
+
+
+def _build_row_offsets(path, is_csv=False):
+    offsets = array("Q")
+    position = 0
+    in_quotes = False
+    with open(path, "rb") as handle:
+        for line in handle:
+            if not in_quotes and line.strip():
+                offsets.append(position)
+            if is_csv and line.count(b'"') % 2:
+                # Quoted CSV fields may span lines; a record only ends once its quotes are balanced.
+                in_quotes = not in_quotes
+            position += len(line)
+    if in_quotes:
+        raise ValueError(f"Manifest {path} ends inside a quoted field.")
+    return offsets
+
+
+def _map_row_index(index_path):
+    with open(index_path, "rb") as handle:
+        return memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)).cast("Q")
+
+
+def _load_row_index(path, stat, is_csv=False):
+    index_path = path + ROW_INDEX_SUFFIX
+    try:
+        mapped = _map_row_index(index_path)
+        if (len(mapped) >= 3 and mapped[0] == ROW_INDEX_VERSION
+                and mapped[1] == stat.st_size and mapped[2] == stat.st_mtime_ns):
+            return mapped[3:]
+    except (OSError, ValueError, TypeError):
+        pass
+
+    offsets = _build_row_offsets(path, is_csv)
+    header = array("Q", [ROW_INDEX_VERSION, stat.st_size, stat.st_mtime_ns])
+
+    def write(temp_path):
+        with open(temp_path, "wb") as handle:
+            header.tofile(handle)
+            offsets.tofile(handle)
+
+    try:
+        atomic_write(index_path, write)
+        return _map_row_index(index_path)[3:]
+    except OSError as exc:
+        print(f"[ManifestSource] Could not write row index for {path}, keeping it in memory: {exc}")
+        return offsets
+
+
+class _LineManifest:
+    def __init__(self, path, stat):
+        self.path = path
+        self.is_csv = path.lower().endswith(".csv")
+        self._offsets = _load_row_index(path, stat, self.is_csv)
+        self._lock = threading.Lock()
+        self._handle = open(path, "rb")
+        self._first_row = 0
+        self.columns = None
+        if self.is_csv and len(self._offsets):
+            self.columns = [name.strip() for name in self._read_csv_record(0)]
+            self._first_row = 1
+
+    def __len__(self):
+        return max(0, len(self._offsets) - self._first_row)
+
+    def _read_record(self, position):
+        start = self._offsets[position]
+        end = self._offsets[position + 1] if position + 1 < len(self._offsets) else None
+        with self._lock:
+            self._handle.seek(start)
+            data = self._handle.read() if end is None else self._handle.read(end - start)
+        return data.decode("utf-8").lstrip("\ufeff")
+
+    def _read_csv_record(self, position):
+        return next(csv.reader(io.StringIO(self._read_record(position), newline="")))
+
+    def row(self, index):
+        position = index + self._first_row
+        if self.is_csv:
+            return dict(zip(self.columns, self._read_csv_record(position)))
+        return json.loads(self._read_record(position))
+
+
+class _ParquetManifest:
+    def __init__(self, path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("Reading Parquet manifests requires pyarrow (pip install pyarrow).") from exc
+
+        self.path = path
+        self._file = pq.ParquetFile(path)
+        self.columns = list(self._file.schema_arrow.names)
+        metadata = self._file.metadata
+        row_counts = [metadata.row_group(group).num_rows for group in range(metadata.num_row_groups)]
+        self._group_starts = list(itertools.accumulate(row_counts, initial=0))
+        self._lock = threading.Lock()
+        self._cached_group = None
+        self._cached_rows = None
+
+    def __len__(self):
+        return self._group_starts[-1]
+
+    def row(self, index):
+        group = bisect.bisect_right(self._group_starts, index) - 1
+        with self._lock:
+            if self._cached_group != group:
+                columns = [name for name in MANIFEST_COLUMNS if name in self.columns]
+                self._cached_rows = self._file.read_row_group(group, columns=columns).to_pydict()
+                self._cached_group = group
+            local_index = index - self._group_starts[group]
+            return {name: values[local_index] for name, values in self._cached_rows.items()}
+
+
+class ManifestColumn(Sequence):
+    def __init__(self, manifest, column):
+        self.manifest = manifest
+        self.column = column
+
+    def __len__(self):
+        return len(self.manifest)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        value = self.manifest.row(index).get(self.column)
+        return str(value).replace("/", os.sep) if value else ""
+
+
+def get_manifest(manifest_path):
+    if not manifest_path.lower().endswith(MANIFEST_EXTENSIONS):
+        raise ValueError(f"Unsupported manifest format: {manifest_path}. Use .csv, .jsonl or .parquet.")
+
+    stat = os.stat(manifest_path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _MANIFESTS_LOCK:
+        cached = _MANIFESTS.get(manifest_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        if manifest_path.lower().endswith(".parquet"):
+            manifest = _ParquetManifest(manifest_path)
+        else:
+            manifest = _LineManifest(manifest_path, stat)
+
+        if manifest.columns is not None and "path" not in manifest.columns:
+            raise ValueError(f"Manifest {manifest_path} has no 'path' column.")
+        _MANIFESTS[manifest_path] = (signature, manifest)
+        return manifest
+
+
+def get_manifest_column(manifest_path, column):
+    return ManifestColumn(get_manifest(manifest_path), column)
+
+
+def get_manifest_root(manifest_path, root_path=""):
+    return root_path or os.path.dirname(os.path.abspath(manifest_path))
@@ -1,5 +1,9 @@
 import os
 
+from .completion_index import is_output_complete
+from .image_io import IMAGE_SAVE_FORMATS, normalize_encoder_profile
+from .write_behind import is_write_pending
+
 
 SAVE_SPEC_TYPE = "ITERATOR_SAVE_SPEC"
 
@@ -31,11 +35,22 @@ def normalize_save_spec(save_spec):
     if not output_root:
         raise ValueError("save_spec.output_root cannot be empty.")
 
+    file_ext = normalize_extension(save_spec.get("file_format") or save_spec.get("file_ext")).lstrip(".")
+    if file_ext not in IMAGE_SAVE_FORMATS:
+        raise ValueError(f"Unsupported save_spec file format: {file_ext}")
+    file_ext = {"jpeg": "jpg", "tif": "tiff"}.get(file_ext, file_ext)
+
     return {
         "output_root": output_root,
         "keep_subfolder": bool(save_spec.get("keep_subfolder", True)),
-        "file_ext": "png",
+        "file_ext": file_ext,
+        "encoder": normalize_encoder_profile(save_spec.get("encoder")),
+        "fsync": bool(save_spec.get("fsync", False)),
+        "verify_existing": bool(save_spec.get("verify_existing", False)),
         "exists_policy": save_spec.get("exists_policy", "skip"),
+        "lease_ttl": max(0, int(save_spec.get("lease_ttl", 0) or 0)),
+        "output_mode": "tar_shards" if save_spec.get("output_mode") == "tar_shards" else "files",
+        "shard_size_mb": max(1, int(save_spec.get("shard_size_mb", 1024) or 1024)),
     }
 
 
@@ -64,12 +79,13 @@ def ensure_parent_dir(path):
 
 
 def is_processing_complete(output_path, save_spec):
-    normalize_save_spec(save_spec)
-    return os.path.exists(output_path)
+    return is_output_complete(normalize_save_spec(save_spec), output_path)
 
 
-def resolve_existing_output(output_path, exists_policy):
-    if not os.path.exists(output_path):
+def resolve_existing_output(output_path, exists_policy, exists=None):
+    if exists is None:
+        exists = os.path.exists(output_path) or is_write_pending(output_path)
+    if not exists:
         return "write"
     if exists_policy == "overwrite":
         return "overwrite"
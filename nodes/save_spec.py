@@ -1,3 +1,4 @@
+from .image_io import DEFAULT_ENCODER_PROFILE, JPEG_SUBSAMPLING_OPTIONS
 from .save_resolver import SAVE_SPEC_TYPE, normalize_save_spec
 
 
@@ -22,6 +23,80 @@ class IteratorSaveSpec:
                     "tooltip": "What the saver should do when the target file already exists.",
                 }),
             },
+            "optional": {
+                "lease_ttl": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 86400,
+                    "step": 1,
+                    "tooltip": "Seconds a worker may hold a claimed image before other workers can take it over. "
+                               "Claims are lock files next to the output. 0 disables claiming.",
+                }),
+                "output_mode": (["files", "tar_shards"], {
+                    "default": "files",
+                    "tooltip": "files writes one file per output. tar_shards appends samples to rolling "
+                               "WebDataset-style tar shards under the output root and records finished keys in "
+                               "completed_keys.tsv for skip detection.",
+                }),
+                "shard_size_mb": ("INT", {
+                    "default": 1024,
+                    "min": 1,
+                    "max": 65536,
+                    "step": 1,
+                    "tooltip": "Start a new tar shard once the current one reaches this size. Only used by tar_shards.",
+                }),
+                "file_format": (["png", "jpg", "webp", "tiff"], {
+                    "default": "png",
+                    "tooltip": "Output format. Also decides which extension the iterator looks for when skipping.",
+                }),
+                "png_compress_level": ("INT", {
+                    "default": DEFAULT_ENCODER_PROFILE["png_compress_level"],
+                    "min": 0,
+                    "max": 9,
+                    "step": 1,
+                    "tooltip": "zlib level for PNG. 1 is several times faster than 9 for slightly larger files.",
+                }),
+                "jpeg_quality": ("INT", {
+                    "default": DEFAULT_ENCODER_PROFILE["jpeg_quality"],
+                    "min": 1,
+                    "max": 100,
+                    "step": 1,
+                }),
+                "jpeg_subsampling": (list(JPEG_SUBSAMPLING_OPTIONS), {
+                    "default": DEFAULT_ENCODER_PROFILE["jpeg_subsampling"],
+                    "tooltip": "Chroma subsampling. 4:4:4 keeps full colour detail at a larger size.",
+                }),
+                "jpeg_progressive": ("BOOLEAN", {
+                    "default": DEFAULT_ENCODER_PROFILE["jpeg_progressive"],
+                }),
+                "webp_quality": ("INT", {
+                    "default": DEFAULT_ENCODER_PROFILE["webp_quality"],
+                    "min": 1,
+                    "max": 100,
+                    "step": 1,
+                    "tooltip": "WEBP quality, or compression effort when lossless is on.",
+                }),
+                "webp_method": ("INT", {
+                    "default": DEFAULT_ENCODER_PROFILE["webp_method"],
+                    "min": 0,
+                    "max": 6,
+                    "step": 1,
+                    "tooltip": "WEBP encoder speed/size trade-off. 0 is fastest, 6 is smallest.",
+                }),
+                "webp_lossless": ("BOOLEAN", {
+                    "default": DEFAULT_ENCODER_PROFILE["webp_lossless"],
+                }),
+                "fsync": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Flush each output to disk before it is renamed into place. Slower, but survives "
+                               "power loss, not just crashes.",
+                }),
+                "verify_existing": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "When the output folder is scanned, check PNG/JPEG/WEBP headers and trailers in "
+                               "parallel and treat damaged files as not done.",
+                }),
+            },
         }
 
     RETURN_TYPES = (SAVE_SPEC_TYPE, "STRING")
@@ -30,11 +105,19 @@ class IteratorSaveSpec:
     CATEGORY = "🚦 ComfyUI_Image_Anything/Iterator"
     DESCRIPTION = "Shared output rules used by both iterator-side skip detection and the final saver."
 
-    def build_spec(self, output_root, keep_subfolder, exists_policy):
+    def build_spec(self, output_root, keep_subfolder, exists_policy, lease_ttl=0, output_mode="files",
+                   shard_size_mb=1024, file_format="png", fsync=False, verify_existing=False, **encoder_options):
         spec = normalize_save_spec({
             "output_root": output_root,
             "keep_subfolder": keep_subfolder,
             "exists_policy": exists_policy,
+            "lease_ttl": lease_ttl,
+            "output_mode": output_mode,
+            "shard_size_mb": shard_size_mb,
+            "file_format": file_format,
+            "encoder": encoder_options,
+            "fsync": fsync,
+            "verify_existing": verify_existing,
         })
 
         summary = (
@@ -42,4 +125,8 @@ class IteratorSaveSpec:
             f"Ext: .{spec['file_ext']} | "
             f"Exists: {spec['exists_policy']}"
         )
+        if spec["lease_ttl"]:
+            summary += f" | Lease: {spec['lease_ttl']}s"
+        if spec["output_mode"] == "tar_shards":
+            summary += f" | Shards: tar ({spec['shard_size_mb']} MB)"
         return (spec, summary)
@@ -0,0 +1,128 @@
+import atexit
+import io
+import os
+import re
+import tarfile
+import threading
+import time
+
+
+SHARD_INDEX_NAME = "completed_keys.tsv"
+SHARD_NAME_PATTERN = "shard-{:06d}.tar"
+_SHARD_NAME_RE = re.compile(r"^shard-(\d+)\.tar$")
+
+_WRITERS = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+def sample_key(rel_path):
+    return os.path.splitext(rel_path)[0].replace(os.sep, "/")
+
+
+def load_completed_keys(output_root):
+    keys = set()
+    try:
+        with open(os.path.join(output_root, SHARD_INDEX_NAME), "r", encoding="utf-8") as handle:
+            for line in handle:
+                key = line.rstrip("\n").split("\t", 1)[0]
+                if key:
+                    keys.add(key)
+    except FileNotFoundError:
+        pass
+    return keys
+
+
+class ShardWriter:
+    def __init__(self, output_root, shard_size_mb):
+        self.output_root = output_root
+        self.shard_size = shard_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._handle = None
+        self._tar = None
+        self._shard_path = None
+        self._next_number = None
+
+    def _first_free_number(self):
+        numbers = []
+        for name in os.listdir(self.output_root):
+            match = _SHARD_NAME_RE.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return max(numbers) + 1 if numbers else 0
+
+    def _roll(self):
+        self._close_shard()
+        os.makedirs(self.output_root, exist_ok=True)
+        if self._next_number is None:
+            self._next_number = self._first_free_number()
+
+        while True:
+            shard_path = os.path.join(self.output_root, SHARD_NAME_PATTERN.format(self._next_number))
+            self._next_number += 1
+            try:
+                # Exclusive create so several workers sharing output_root never append to the same shard.
+                self._handle = open(shard_path, "xb")
+            except FileExistsError:
+                continue
+            break
+
+        self._tar = tarfile.open(fileobj=self._handle, mode="w")
+        self._shard_path = shard_path
+        print(f"[ShardWriter] Writing new shard {shard_path}")
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._handle.close()
+        self._tar = None
+        self._handle = None
+        self._shard_path = None
+
+    def write_sample(self, key, members):
+        with self._lock:
+            if self._tar is None or self._handle.tell() >= self.shard_size:
+                self._roll()
+
+            mtime = time.time()
+            for extension, data in members.items():
+                info = tarfile.TarInfo(f"{key}.{extension}")
+                info.size = len(data)
+                info.mtime = mtime
+                self._tar.addfile(info, io.BytesIO(data))
+            self._handle.flush()
+
+            with open(os.path.join(self.output_root, SHARD_INDEX_NAME), "a", encoding="utf-8") as index:
+                index.write(f"{key}\t{os.path.basename(self._shard_path)}\n")
+            return self._shard_path
+
+    def close(self):
+        with self._lock:
+            self._close_shard()
+
+
+def get_shard_writer(save_spec):
+    output_root = os.path.abspath(save_spec["output_root"])
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(output_root)
+        if writer is None:
+            writer = ShardWriter(output_root, save_spec["shard_size_mb"])
+            _WRITERS[output_root] = writer
+        writer.shard_size = save_spec["shard_size_mb"] * 1024 * 1024
+        return writer
+
+
+def write_shard_sample(save_spec, output_path, members):
+    output_root = os.path.abspath(save_spec["output_root"])
+    key = sample_key(os.path.relpath(os.path.abspath(output_path), output_root))
+    shard_path = get_shard_writer(save_spec).write_sample(key, members)
+    return f"{shard_path}/{key}"
+
+
+def close_shard_writers():
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_shard_writers)
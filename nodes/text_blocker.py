@@ -5,14 +5,21 @@
 - 前端监听ComfyUI原生的executing事件
 - 检测到TextBlocker节点执行时显示编辑模态框
 - 通过HTTP POST发送编辑结果
-- 后端轮询等待HTTP消息
+- 后端通过 threading.Event 等待HTTP消息，提交后立即唤醒
 """
 
+import threading
 import time
 import uuid
 from aiohttp import web
 from server import PromptServer
 
+import comfy.model_management
+
+
+# 等待期间检查 ComfyUI 中断标志的间隔（秒），不影响提交后的唤醒延迟
+INTERRUPT_CHECK_INTERVAL = 0.5
+
 
 class TextBlockerMessage:
     """
@@ -21,10 +28,11 @@ class TextBlockerMessage:
     关键：不依赖WebSocket自定义事件，使用HTTP桥接
     """
     
-    # 存储每个节点的等待状态
+    # 存储每个节点的等待槽位 {"event": threading.Event, "result": dict | None}
     stash = {}
     # 存储每个节点的当前文本（供前端查询）
     current_texts = {}
+    _lock = threading.Lock()
     
     @classmethod
     def set_current_text(cls, node_id, text):
@@ -40,7 +48,10 @@ class TextBlockerMessage:
     @classmethod
     def wait_for_message(cls, node_id, timeout=3600):
         """
-        轮询等待前端提交的消息
+        等待前端提交的消息
+        
+        HTTP 提交路由设置事件后立即唤醒等待线程；等待期间定期检查
+        ComfyUI 的中断标志，以便用户中断时能及时退出。
         
         Args:
             node_id: 节点唯一ID
@@ -52,32 +63,30 @@ class TextBlockerMessage:
         Raises:
             TimeoutError: 等待超时
             InterruptedError: 用户取消编辑
+            InterruptProcessingException: ComfyUI 中断了当前执行
         """
-        # 创建等待槽位
-        if node_id not in cls.stash:
-            cls.stash[node_id] = {"waiting": True, "result": None}
-        
-        # 重置状态
-        cls.stash[node_id]["waiting"] = True
-        cls.stash[node_id]["result"] = None
+        # 创建新的等待槽位
+        slot = {"event": threading.Event(), "result": None}
+        with cls._lock:
+            cls.stash[node_id] = slot
         
-        print(f"[text_blocker] poll: waiting node={node_id}")
+        print(f"[text_blocker] wait: node={node_id}")
         
-        # 轮询等待结果
-        start_time = time.time()
-        poll_count = 0
-        
-        while cls.stash[node_id]["waiting"]:
-            if time.time() - start_time > timeout:
-                raise TimeoutError(f"等待超时 (节点ID: {node_id})")
-            
-            poll_count += 1
-            if poll_count % 50 == 0:  # 每5秒打印一次
-                print(f"[text_blocker] poll: {int(time.time() - start_time)}s elapsed")
-            
-            time.sleep(0.1)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待超时 (节点ID: {node_id})")
+                if slot["event"].wait(min(INTERRUPT_CHECK_INTERVAL, remaining)):
+                    break
+                comfy.model_management.throw_exception_if_processing_interrupted()
+        finally:
+            with cls._lock:
+                if cls.stash.get(node_id) is slot:
+                    del cls.stash[node_id]
         
-        result = cls.stash[node_id]["result"]
+        result = slot["result"]
         
         # 检查是否被取消
         if result is None or result.get("cancelled", False):
@@ -88,7 +97,7 @@ class TextBlockerMessage:
     @classmethod
     def receive_message(cls, node_id, text, cancelled=False):
         """
-        接收前端POST的消息
+        接收前端POST的消息并唤醒等待中的节点
         
         Args:
             node_id: 节点唯一ID
@@ -97,14 +106,18 @@ class TextBlockerMessage:
         """
         print(f"[text_blocker] recv: node={node_id} cancelled={cancelled}")
         
-        if node_id in cls.stash:
-            cls.stash[node_id]["waiting"] = False
-            cls.stash[node_id]["result"] = {
-                "text": text,
-                "cancelled": cancelled
-            }
-        else:
+        with cls._lock:
+            slot = cls.stash.get(node_id)
+        
+        if slot is None:
             print(f"[text_blocker] warn: no slot for {node_id}")
+            return
+        
+        slot["result"] = {
+            "text": text,
+            "cancelled": cancelled
+        }
+        slot["event"].set()
 
 
 # 注册HTTP API路由
@@ -236,13 +249,16 @@ class TextBlocker:
         # 存储当前文本，供前端查询
         TextBlockerMessage.set_current_text(unique_id, text)
         
-        # 开始轮询等待
+        # 开始等待前端提交
         print(f"[TextBlocker] blocking, awaiting frontend...")
         
         try:
             edited_text = TextBlockerMessage.wait_for_message(unique_id)
             print(f"[TextBlocker] done: received len={len(edited_text)}")
             return (edited_text,)
+        except comfy.model_management.InterruptProcessingException:
+            print(f"[TextBlocker] interrupted by ComfyUI")
+            raise
         except InterruptedError:
             print(f"[TextBlocker] cancelled, returning original")
             return (text,)
@@ -0,0 +1,80 @@
+import os
+import socket
+import threading
+import time
+
+
+_HELD = {}
+_HELD_LOCK = threading.Lock()
+
+
+def lease_path(output_path):
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.lease")
+
+
+def _read_lease(path):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return handle.read()
+    except OSError:
+        return None
+
+
+def is_leased(output_path):
+    return os.path.exists(lease_path(output_path))
+
+
+def try_claim_lease(output_path, ttl):
+    path = lease_path(output_path)
+    with _HELD_LOCK:
+        token = _HELD.pop(path, None)
+    if token is not None:
+        if _read_lease(path) == token:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with _HELD_LOCK:
+                _HELD[path] = token
+            return True
+        print(f"[WorkLease] Lease {path} was taken over by another worker.")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    for _attempt in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except OSError:
+                continue
+            if age < ttl:
+                return False
+            print(f"[WorkLease] Reclaiming expired lease {path} ({int(age)}s old).")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+
+        token = f"{socket.gethostname()} {os.getpid()} {threading.get_ident()} {time.time():.6f}\n"
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(token)
+        with _HELD_LOCK:
+            _HELD[path] = token
+        return True
+
+    return False
+
+
+def release_lease(output_path):
+    path = lease_path(output_path)
+    with _HELD_LOCK:
+        token = _HELD.pop(path, None)
+    if token is None or _read_lease(path) != token:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
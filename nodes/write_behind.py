@@ -0,0 +1,104 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from aiohttp import web
+from server import PromptServer
+
+from .atomic_io import atomic_write
+
+
+WRITE_BEHIND_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+WRITE_BEHIND_MAX_PENDING = 16
+
+_EXECUTOR = None
+_LOCK = threading.Lock()
+_SLOTS = threading.BoundedSemaphore(WRITE_BEHIND_MAX_PENDING)
+_PENDING = {}
+_ERRORS = []
+_STATS = {"submitted": 0, "completed": 0, "failed": 0}
+
+
+def _get_executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=WRITE_BEHIND_MAX_WORKERS,
+            thread_name_prefix="image_anything_write",
+        )
+    return _EXECUTOR
+
+
+def _run_write(path, encode, on_error, on_success, fsync):
+    try:
+        atomic_write(path, encode, fsync=fsync)
+        with _LOCK:
+            _STATS["completed"] += 1
+        if on_success is not None:
+            on_success()
+    except Exception as exc:
+        with _LOCK:
+            _STATS["failed"] += 1
+            _ERRORS.append({"path": path, "error": str(exc)})
+        print(f"[WriteBehind] Failed to write {path}: {exc}")
+        if on_error is not None:
+            on_error()
+    finally:
+        with _LOCK:
+            _PENDING.pop(path, None)
+        _SLOTS.release()
+
+
+def submit_write(path, encode, on_error=None, on_success=None, reserve=False, fsync=False):
+    raise_pending_errors()
+    _SLOTS.acquire()
+    try:
+        if reserve:
+            open(path, "ab").close()
+        with _LOCK:
+            _STATS["submitted"] += 1
+            _PENDING[path] = _get_executor().submit(_run_write, path, encode, on_error, on_success, fsync)
+    except Exception:
+        _SLOTS.release()
+        raise
+
+
+def is_write_pending(path):
+    with _LOCK:
+        return path in _PENDING
+
+
+def raise_pending_errors():
+    with _LOCK:
+        errors = list(_ERRORS)
+        _ERRORS.clear()
+    if errors:
+        details = "; ".join(f"{item['path']}: {item['error']}" for item in errors[:5])
+        if len(errors) > 5:
+            details += f"; ... {len(errors) - 5} more"
+        raise RuntimeError(f"{len(errors)} background write(s) failed: {details}")
+
+
+def flush_writes(timeout=None):
+    with _LOCK:
+        futures = list(_PENDING.values())
+    if futures:
+        wait(futures, timeout=timeout)
+
+
+def get_write_status():
+    with _LOCK:
+        return {
+            **_STATS,
+            "pending": len(_PENDING),
+            "errors": list(_ERRORS),
+        }
+
+
+atexit.register(flush_writes)
+
+
+@PromptServer.instance.routes.get("/image_anything/write-status")
+async def write_status(request):
+    return web.json_response(get_write_status())
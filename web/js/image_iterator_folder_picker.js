@@ -143,6 +143,11 @@ async function openFolderPicker(node) {
             return;
         }
 
+        if (payload.status === "timeout") {
+            showToast(payload.message || config.cancelledMessage);
+            return;
+        }
+
         folderPathWidget.value = payload.path;
         if (typeof folderPathWidget.callback === "function") {
             folderPathWidget.callback(payload.path);